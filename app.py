@@ -1,241 +1,855 @@
 import os
-import inspect
-import sqlite3
-from flask import Flask, render_template, request, send_file, redirect, url_for
+import time
+import hashlib
+import functools
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlencode
+from flask import (Flask, Response, render_template, request, send_file, send_from_directory, redirect, url_for,
+                   jsonify, stream_with_context, g, abort)
 
-from reportlab.pdfgen import canvas
-from reportlab.lib import pagesizes
-from reportlab.lib.units import mm
 from io import BytesIO
 
+import stats
+import batch
+import gridpdf
+import metrics
+import grid_types
+import preview
+import cost_model
+import profiling
+from gridpdf import format_pdf_number
+from grids import (AVAILABLE_PAPER_SIZES, GRID_QUERY_DEFAULTS, PREDEFINED_SIZE_NAMES, STREAM_MIN_BYTES,
+                   canonical_spec, create_grid_pdf, iter_grid_type_pdf, parse_grid_params, query_grid_args,
+                   render_budget_error, spec_etag, spec_key)
+from render_cache import RenderCache
+from render_pool import RenderPool, RenderQueueFull, RenderTimeout
+
 app = Flask(__name__)
+app.logger.setLevel(os.environ.get('GRID_LOG_LEVEL', 'INFO'))
+
+# SQLite database with the download counter and the render log
+DATABASE = os.environ.get('GRID_DATABASE', 'statistics.db')
+
+# Downloads are counted in memory and written to SQLite in batches.
+PDF_COUNTER = stats.PdfCounter(
+    DATABASE,
+    flush_interval=float(os.environ.get('GRID_COUNTER_FLUSH_INTERVAL', 5.0)),
+    flush_threshold=int(os.environ.get('GRID_COUNTER_FLUSH_THRESHOLD', 50)),
+    read_ttl=float(os.environ.get('GRID_COUNTER_READ_TTL', 2.0)),
+)
+
+# Every served PDF is logged to render_log in batches for usage analytics.
+REQUEST_LOG = stats.RequestLog(
+    DATABASE,
+    flush_interval=float(os.environ.get('GRID_ANALYTICS_FLUSH_INTERVAL', 5.0)),
+    flush_threshold=int(os.environ.get('GRID_ANALYTICS_FLUSH_THRESHOLD', 200)),
+)
+
+# Rendered PDFs are cached in-process (bounded by bytes) and in a directory
+# shared by all gunicorn workers on the same machine.
+RENDER_CACHE = RenderCache(
+    max_bytes=int(os.environ.get('GRID_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    cache_dir=os.environ.get('GRID_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'grid_web_cache')),
+    disk_max_bytes=int(os.environ.get('GRID_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024)),
+)
+
+# Specs estimated (by cost_model) to take longer than this render on a
+# separate pool so they cannot starve the common small requests. Specs over
+# the hard limits in grids are rejected.
+SLOW_LANE_SECONDS = float(os.environ.get('GRID_SLOW_LANE_SECONDS', 0.05))
+
+# Responses from /grid.pdf are addressed by canonical URL and never change.
+GRID_PDF_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# The GET / page is rendered once per process and may be reused by browsers
+# for this many seconds before they revalidate it against its ETag.
+INDEX_MAX_AGE = int(os.environ.get('GRID_INDEX_MAX_AGE', 300))
+
+# Paper sizes whose default grid is rendered into the cache before gunicorn
+# forks its workers (see gunicorn.conf.py)
+WARM_PAPER_SIZES = [name for name in os.environ.get('GRID_WARM_PAPER_SIZES', 'A4,LETTER,A5,A3,LEGAL').split(',')
+                    if name]
+
+# The most requested specs of the last GRID_PREWARM_WINDOW_HOURS are
+# rendered into the cache at startup and every GRID_PREWARM_INTERVAL seconds
+# (0 disables the periodic job). Analytics older than the retention period
+# are deleted by the same job.
+PREWARM_TOP_K = int(os.environ.get('GRID_PREWARM_TOP_K', 20))
+PREWARM_WINDOW_SECONDS = float(os.environ.get('GRID_PREWARM_WINDOW_HOURS', 7 * 24)) * 3600
+PREWARM_INTERVAL = float(os.environ.get('GRID_PREWARM_INTERVAL', 600))
+ANALYTICS_RETENTION_SECONDS = float(os.environ.get('GRID_ANALYTICS_RETENTION_DAYS', 30)) * 86400
 
-DATABASE = 'statistics.db'
+# Limits for the /batch endpoint. Batches render on BATCH_POOL, shared by
+# all batches of a worker process, and at most BATCH_CONCURRENCY batches run
+# at a time per process; more get a 503. A batch's summed render estimate,
+# spread over BATCH_WORKERS, must stay under BATCH_MAX_SECONDS so the
+# streamed ZIP completes well within gunicorn's worker timeout.
+BATCH_MAX_SPECS = int(os.environ.get('GRID_BATCH_MAX_SPECS', 500))
+BATCH_WORKERS = int(os.environ.get('GRID_BATCH_WORKERS', os.cpu_count() or 1))
+BATCH_CONCURRENCY = int(os.environ.get('GRID_BATCH_CONCURRENCY', 1))
+BATCH_MAX_SECONDS = float(os.environ.get('GRID_BATCH_MAX_SECONDS', 20))
+
+# Renders run in a bounded process pool so one huge sheet cannot pin the
+# request worker. GRID_RENDER_WORKERS=0 renders inline instead. gunicorn.conf.py
+# derives the worker timeout from these timeouts; keep them in step.
+RENDER_POOL = RenderPool(
+    max_workers=int(os.environ.get('GRID_RENDER_WORKERS', 2)),
+    max_pending=int(os.environ.get('GRID_RENDER_QUEUE', 8)),
+    timeout=float(os.environ.get('GRID_RENDER_TIMEOUT', 30)),
+    retry_after=int(os.environ.get('GRID_RENDER_RETRY_AFTER', 5)),
+)
+
+RENDER_SLOW_POOL = RenderPool(
+    max_workers=int(os.environ.get('GRID_SLOW_RENDER_WORKERS', 1)),
+    max_pending=int(os.environ.get('GRID_SLOW_RENDER_QUEUE', 2)),
+    timeout=float(os.environ.get('GRID_SLOW_RENDER_TIMEOUT', 120)),
+    retry_after=int(os.environ.get('GRID_RENDER_RETRY_AFTER', 5)) * 6,
+)
+
+# Each running batch keeps up to two renders per batch worker in flight. A
+# batch holds its slot in _batch_slots until those renders have finished,
+# even if its client went away, so BATCH_CONCURRENCY batches never need more
+# than max_pending.
+BATCH_POOL = RenderPool(
+    max_workers=BATCH_WORKERS,
+    max_pending=2 * BATCH_WORKERS * BATCH_CONCURRENCY,
+    timeout=BATCH_MAX_SECONDS,
+    retry_after=int(os.environ.get('GRID_RENDER_RETRY_AFTER', 5)) * 6,
+)
+_batch_slots = threading.BoundedSemaphore(BATCH_CONCURRENCY)
+
+# Per-worker metrics, aggregated across workers at /metrics
+METRICS = metrics.Metrics(
+    os.environ.get('GRID_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'grid_web_metrics'))
+)
+METRICS.histogram('grid_stage_seconds', 'Time spent in each request and render stage.', metrics.SECONDS_BUCKETS)
+METRICS.histogram('grid_output_bytes', 'Size of rendered PDFs.', metrics.BYTES_BUCKETS)
+METRICS.histogram('grid_render_lines', 'Grid lines per rendered PDF.', metrics.LINES_BUCKETS)
+METRICS.counter('grid_errors_total', 'Failed requests by kind.')
+METRICS.counter('grid_paper_size_total', 'Valid requests by paper size choice.')
+METRICS.counter('grid_renders_coalesced_total',
+                'Renders saved by waiting for the same spec to finish rendering, by scope (thread or process).')
+RENDER_CACHE.on_coalesce = lambda scope: METRICS.inc('grid_renders_coalesced_total', scope=scope)
+
+# Previews are small and cheap to recompute, so they are cached in memory only
+PREVIEW_CACHE = RenderCache(max_bytes=int(os.environ.get('GRID_PREVIEW_CACHE_MAX_BYTES', 8 * 1024 * 1024)))
+
+# Sampled cProfile/tracemalloc profiles of / and /grid.pdf requests and of
+# the renders they start, kept in a directory shared by all workers and
+# listed at /profiles. GRID_PROFILE_RATE samples that fraction of requests
+# at random. With GRID_PROFILE_TOKEN set, a request carrying the token in
+# PROFILE_HEADER is always sampled. /profiles always requires the token and
+# is not served at all without one.
+PROFILE_HEADER = 'X-Grid-Profile'
+PROFILER = profiling.Profiler(
+    os.environ.get('GRID_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'grid_web_profiles')),
+    rate=float(os.environ.get('GRID_PROFILE_RATE', 0)),
+    token=os.environ.get('GRID_PROFILE_TOKEN') or None,
+    keep=int(os.environ.get('GRID_PROFILE_KEEP', 200)),
+)
 
 def init_db():
     """Initialize the database and create the statistics table if it doesn't exist."""
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS statistics (
-            id INTEGER PRIMARY KEY,
-            pdf_count INTEGER DEFAULT 0
-        )
-    ''')
-    # Ensure there's a row in the table
-    c.execute('SELECT COUNT(*) FROM statistics')
-    if c.fetchone()[0] == 0:
-        c.execute('INSERT INTO statistics (pdf_count) VALUES (0)')
-    conn.commit()
-    conn.close()
-
-def increment_pdf_count():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('UPDATE statistics SET pdf_count = pdf_count + 1 WHERE id = 1')
-    conn.commit()
-    conn.close()
+    stats.init_db(DATABASE)
+
+def increment_pdf_count(amount=1):
+    PDF_COUNTER.increment(amount)
 
 def get_pdf_count():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('SELECT pdf_count FROM statistics WHERE id = 1')
-    count = c.fetchone()[0]
-    conn.close()
-    return count
+    return PDF_COUNTER.get_count()
+
+def parse_download_params(data):
+    """
+    Validate a download request like parse_grid_params, counting failures by kind.
+
+    Previews validate the same fields on every form change, so only
+    downloads update grid_errors_total; see also count_paper_size.
+    """
+    spec, output_filename, errors = parse_grid_params(data, check_budget=False)
+    if errors:
+        METRICS.inc('grid_errors_total', kind='validation')
+        return None, output_filename, errors
+    budget_error = render_budget_error(spec)
+    if budget_error:
+        METRICS.inc('grid_errors_total', kind='budget')
+        return None, output_filename, [budget_error]
+    return spec, output_filename, errors
+
+def count_paper_size(data):
+    """Count a download by its paper size choice: the predefined size's name, or "custom"."""
+    predefined = data.get('paper_size_option') == 'predefined'
+    METRICS.inc('grid_paper_size_total', paper_size=data.get('predefined_size') if predefined else 'custom')
+
+def render_spec(spec):
+    """Render a canonical spec to PDF bytes. Runs in batch worker processes."""
+    with create_grid_pdf(**spec) as pdf:
+        return pdf.read()
+
+@contextmanager
+def profiled_render(spec, timings, profile):
+    """Record the block as a "render" sample tagged with the spec and its timings if profile is set."""
+    if not profile:
+        yield
+        return
+    with PROFILER.sample('render') as tags:
+        if tags is not None:
+            tags['spec'] = spec_key(spec)
+            tags['timings'] = timings
+        yield
+
+def render_spec_timed(spec, profile=False):
+    """Render a canonical spec in a pool worker, returning (bytes, stage timings, stream sizes)."""
+    timings = {}
+    sizes = {}
+    with profiled_render(spec, timings, profile):
+        with create_grid_pdf(**spec, timings=timings, sizes=sizes) as pdf:
+            data = pdf.read()
+    return data, timings, sizes
 
-def get_available_paper_sizes():
+def render_spec_to_cache(spec, profile=False):
     """
-    Retrieve all available paper sizes from reportlab.lib.pagesizes.
-    
+    Render a canonical spec into the disk tier of RENDER_CACHE in a pool worker.
+
+    The document goes from the worker's spooled file to the cache file, so a
+    large sheet never passes through the web process's memory. With profile
+    set, the render is recorded as a profiling sample.
+
     Returns:
-        dict: A dictionary mapping paper size names to their (width, height) in points.
-    """
-    available_sizes = {}
-    for name, size in inspect.getmembers(pagesizes):
-        if name.isupper() and isinstance(size, tuple) and len(size) == 2:
-            available_sizes[name] = size
-    return available_sizes
-
-AVAILABLE_PAPER_SIZES = get_available_paper_sizes()
-
-def validate_hex_color(hex_color):
-    """Validate if the provided string is a valid hex color code."""
-    if not isinstance(hex_color, str):
-        return False
-    if not hex_color.startswith("#"):
-            return False
-    if len(hex_color) not in [4, 7]:
-        return False
-    hex_digits = "0123456789ABCDEFabcdef"
-    for char in hex_color[1:]:
-        if char not in hex_digits:
-            return False
-    return True
-
-def create_grid_pdf(paper_width_mm, paper_height_mm, grid_size_mm=5, grid_color="#B7C9EE",
-                    background_color="#FFFFFF", line_thickness=0.3):
-    """
-    Create a vector-based grid PDF using ReportLab with specified paper size and background color.
-    
+        tuple: (path, file bytes, stage timings, stream sizes) where path is
+        None if the disk tier could not store the document.
+    """
+    timings = {}
+    sizes = {}
+    with profiled_render(spec, timings, profile):
+        with create_grid_pdf(**spec, timings=timings, sizes=sizes) as pdf:
+            size = pdf.seek(0, os.SEEK_END)
+            pdf.seek(0)
+            path = RENDER_CACHE.put_file(spec_key(spec), pdf, sizes or None)
+    return path, size, timings, sizes
+
+def warm_specs():
+    """Return the canonical specs of the default grid on each of WARM_PAPER_SIZES."""
+    specs = []
+    for name in WARM_PAPER_SIZES:
+        if name not in AVAILABLE_PAPER_SIZES:
+            app.logger.warning("Unknown paper size in GRID_WARM_PAPER_SIZES: %s", name)
+            continue
+        width_pt, height_pt = AVAILABLE_PAPER_SIZES[name]
+        specs.append(canonical_spec(
+            paper_width_mm=width_pt / gridpdf.MM,
+            paper_height_mm=height_pt / gridpdf.MM,
+            grid_size_mm=GRID_QUERY_DEFAULTS['grid_size_mm'],
+            grid_color=GRID_QUERY_DEFAULTS['grid_color'],
+            background_color=GRID_QUERY_DEFAULTS['background_color'],
+            line_thickness=GRID_QUERY_DEFAULTS['line_thickness'],
+        ))
+    return specs
+
+def popular_specs(limit=None):
+    """
+    Return the most requested specs from the render log, most popular first.
+
+    Logged specs are re-canonicalized so entries written before a field was
+    added still match; specs that can no longer be rendered, and sheets above
+    STREAM_MIN_BYTES (which are only cached on disk, when first requested),
+    are skipped.
+
+    Parameters:
+    - limit (int): Number of specs to consider. Defaults to PREWARM_TOP_K.
+    """
+    specs = []
+    since = time.time() - PREWARM_WINDOW_SECONDS
+    for logged, _ in stats.top_specs(DATABASE, PREWARM_TOP_K if limit is None else limit, since):
+        try:
+            spec = canonical_spec(**logged)
+        except (TypeError, ValueError):
+            continue
+        if cost_model.estimate(spec)['file_bytes'] > STREAM_MIN_BYTES:
+            continue
+        specs.append(spec)
+    return specs
+
+def warm_render_cache(specs=None):
+    """
+    Render specs into RENDER_CACHE unless they are already cached.
+
+    Renders run inline rather than on the render pools, so this is safe to
+    call in the gunicorn master before it forks; workers inherit the
+    in-memory tier and share the disk tier.
+
     Parameters:
-    - paper_width_mm (float): Width of the paper in millimeters.
-    - paper_height_mm (float): Height of the paper in millimeters.
-    - grid_size_mm (float): Size of each grid square in millimeters.
-    - grid_color (str): Hex color code for the grid lines.
-    - background_color (str): Hex color code for the background.
-    - line_thickness (float): Thickness of the grid lines in points.
-    
+    - specs (list): Canonical specs. Defaults to warm_specs() followed by
+      popular_specs().
+
+    Returns:
+        int: The number of specs rendered.
+    """
+    if specs is None:
+        specs = warm_specs() + popular_specs()
+    rendered = 0
+    for spec in specs:
+        key = spec_key(spec)
+        if RENDER_CACHE.get(key) is not None:
+            continue
+        data, _, sizes = render_spec_timed(spec)
+        RENDER_CACHE.put(key, data, sizes or None)
+        rendered += 1
+    return rendered
+
+def prewarm_popular_specs():
+    """
+    Prune old analytics and render the current top specs into the cache.
+
+    Returns:
+        int: The number of specs rendered.
+    """
+    stats.prune_request_log(DATABASE, time.time() - ANALYTICS_RETENTION_SECONDS)
+    return warm_render_cache(popular_specs())
+
+def start_prewarm_thread():
+    """
+    Run prewarm_popular_specs every PREWARM_INTERVAL seconds in a daemon thread.
+
+    Every worker starts the thread, but a lock file in the shared cache
+    directory lets only one worker run the job per interval.
+
     Returns:
-        BytesIO: In-memory PDF file.
+        threading.Thread or None: The thread, or None if the job is disabled.
+    """
+    import fcntl  # POSIX only; the job is not started elsewhere
+
+    if PREWARM_INTERVAL <= 0 or not RENDER_CACHE.cache_dir:
+        return None
+    lock_path = os.path.join(RENDER_CACHE.cache_dir, 'prewarm.lock')
+
+    def run_once():
+        with open(lock_path, 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            try:
+                if time.time() - os.fstat(lock.fileno()).st_mtime < PREWARM_INTERVAL / 2:
+                    return
+                os.utime(lock_path)
+                start = time.perf_counter()
+                rendered = prewarm_popular_specs()
+                app.logger.info("Pre-warmed %d popular specs in %.1f ms", rendered,
+                                (time.perf_counter() - start) * 1000)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def loop():
+        while True:
+            time.sleep(PREWARM_INTERVAL)
+            try:
+                run_once()
+            except Exception as e:
+                app.logger.warning("Pre-warming popular specs failed: %s", e)
+
+    thread = threading.Thread(target=loop, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+def record_render_cost(spec, cost, lane, seconds, size, template=False):
+    """
+    Log a render's estimated cost next to its actual cost and update metrics.
+
+    template is set for pages written from a cached PageTemplate; their
+    lines are logged with template=1 and left out when recalibrating
+    cost_model, which estimates full renders.
+    """
+    METRICS.observe('grid_output_bytes', size)
+    METRICS.observe('grid_render_lines', cost['lines'])
+    app.logger.info(
+        "render cost lane=%s template=%d lines=%d est_ms=%.1f actual_ms=%.1f est_bytes=%d actual_bytes=%d spec=%s",
+        lane, template, cost['lines'], cost['render_seconds'] * 1000, seconds * 1000,
+        cost['file_bytes'], size, spec_key(spec)
+    )
+
+def iter_logged(chunks, spec, cost, lane):
+    """Pass through a streamed render, logging its cost once it completes."""
+    start = time.perf_counter()
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+    seconds = time.perf_counter() - start
+    METRICS.observe('grid_stage_seconds', seconds, stage='render_stream')
+    record_render_cost(spec, cost, lane, seconds, size)
+    REQUEST_LOG.record(spec, seconds, size, cached=False)
+
+def set_stream_size_headers(response, sizes):
+    """Report cached content stream sizes (the document's cache metadata, or None) in response headers."""
+    if sizes is not None:
+        response.headers['X-Grid-Stream-Bytes'] = str(sizes['stream_bytes'])
+        response.headers['X-Grid-Stream-Compressed-Bytes'] = str(sizes['compressed_bytes'])
+
+def stream_grid_pdf(spec, output_filename, cost, lane):
+    """Build a response that streams a sheet as it is written, without caching it."""
+    response = Response(iter_logged(iter_grid_type_pdf(**spec), spec, cost, lane), mimetype='application/pdf')
+    response.headers.set('Content-Disposition', 'attachment', filename=output_filename)
+    return response
+
+def send_large_grid_pdf(spec, output_filename, etag, cost, pool, lane):
+    """
+    Build the download response for a sheet larger than STREAM_MIN_BYTES.
+
+    The sheet is rendered by a pool worker straight into the disk tier of the
+    render cache and sent from that file. send_file passes the open file to
+    the server's wsgi.file_wrapper, which gunicorn sends with sendfile(2),
+    and answers Range requests from it, so an interrupted download resumes
+    without rendering again. Without a disk tier, or if the file cannot be
+    written or has been pruned, the sheet is streamed instead.
     """
-    buffer = BytesIO()
+    key = spec_key(spec)
+    profile_tags = g.get('profile_tags')
+    rendered = []
+
+    def render():
+        rendered.append(True)
+        path, size, timings, sizes = pool.run(render_spec_to_cache, spec, profile_tags is not None)
+        if profile_tags is not None:
+            profile_tags['timings'] = timings
+        for stage, seconds in timings.items():
+            METRICS.observe('grid_stage_seconds', seconds, stage='render_' + stage)
+        record_render_cost(spec, cost, lane, time.perf_counter() - start, size, 'template' in timings)
+        return path
+
+    start = time.perf_counter()
+    path = RENDER_CACHE.path(key)
+    if path is None and RENDER_CACHE.cache_dir:
+        # Concurrent downloads of the same sheet share one render
+        path = RENDER_CACHE.single_flight(key, lambda: RENDER_CACHE.path(key, count=False), render)
+    if path is None:
+        return stream_grid_pdf(spec, output_filename, cost, 'stream')
     try:
-        # Convert paper size from mm to points
-        paper_width_pt = paper_width_mm * mm
-        paper_height_pt = paper_height_mm * mm
-
-        # Create a canvas with custom paper size
-        c = canvas.Canvas(buffer, pagesize=(paper_width_pt, paper_height_pt))
-
-        # Set background color
-        background_color_rgb = tuple(int(background_color.lstrip("#")[i:i+2], 16)/255 for i in (0, 2, 4))
-        c.setFillColorRGB(*background_color_rgb)
-        c.rect(0, 0, paper_width_pt, paper_height_pt, fill=1, stroke=0)
-
-        # Convert grid size to points
-        grid_size_pt = grid_size_mm * mm
-
-        # Convert hex color to RGB (0-1 range)
-        grid_color_rgb = tuple(int(grid_color.lstrip("#")[i:i+2], 16)/255 for i in (0, 2, 4))
-
-        # Set grid line color and line width
-        c.setStrokeColorRGB(*grid_color_rgb)
-        c.setLineWidth(line_thickness)  # Set line width based on user input
-
-        # Draw vertical lines
-        x = 0
-        while x <= paper_width_pt:
-            c.line(x, 0, x, paper_height_pt)
-            x += grid_size_pt
-
-        # Draw horizontal lines
-        y = 0
-        while y <= paper_height_pt:
-            c.line(0, y, paper_width_pt, y)
-            y += grid_size_pt
-
-        # Finalize the PDF
-        c.save()
-        buffer.seek(0)
-        return buffer
-    except Exception as e:
-        buffer.close()
-        raise RuntimeError(f"Failed to create PDF: {e}")
+        with METRICS.time('grid_stage_seconds', stage='send_file'):
+            response = send_file(
+                os.path.abspath(path),
+                as_attachment=True,
+                download_name=output_filename,
+                mimetype='application/pdf',
+                etag=etag
+            )
+    except FileNotFoundError:
+        # Pruned by another worker since it was looked up or written
+        return stream_grid_pdf(spec, output_filename, cost, 'stream')
+    # Resumed (206) downloads are not new requests for the spec
+    if response.status_code == 200:
+        REQUEST_LOG.record(spec, time.perf_counter() - start, os.path.getsize(path), cached=not rendered)
+    set_stream_size_headers(response, RENDER_CACHE.meta(key))
+    return response
+
+def send_grid_pdf(spec, output_filename):
+    """
+    Build the download response for a canonical spec.
+
+    The response carries a strong ETag derived from the spec. A request whose
+    If-None-Match matches it gets a 304 without rendering anything, and Range
+    requests (with If-Range) are answered from the complete document. Sheets
+    above STREAM_MIN_BYTES are sent from a file (see send_large_grid_pdf);
+    everything else goes through the render cache. Both are rendered on the
+    fast or slow pool according to their estimated cost, and concurrent
+    requests for a spec that is not cached yet wait for a single render, in
+    this worker or another (see RenderCache.single_flight).
+
+    Cached responses report the page content stream's size before and after
+    compression in X-Grid-Stream-Bytes and X-Grid-Stream-Compressed-Bytes,
+    so compact and standard output can be compared. The sizes are kept in
+    the render cache as the document's metadata; streamed responses omit them.
+    """
+    etag = spec_etag(spec)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    cost = cost_model.estimate(spec)
+    if cost['render_seconds'] > SLOW_LANE_SECONDS:
+        pool, lane = RENDER_SLOW_POOL, 'slow'
+    else:
+        pool, lane = RENDER_POOL, 'fast'
+    profile_tags = g.get('profile_tags')
+    if profile_tags is not None:
+        profile_tags.update(spec=spec_key(spec), lane=lane, estimated_seconds=cost['render_seconds'])
+
+    if cost['file_bytes'] > STREAM_MIN_BYTES:
+        response = send_large_grid_pdf(spec, output_filename, etag, cost, pool, lane)
+    else:
+        # Generate PDF, reusing a cached render of the same canonical spec
+        key = spec_key(spec)
+        rendered = []
+
+        def render():
+            rendered.append(True)
+            start = time.perf_counter()
+            data, timings, sizes = pool.run(render_spec_timed, spec, profile_tags is not None)
+            if profile_tags is not None:
+                profile_tags['timings'] = timings
+            for stage, seconds in timings.items():
+                METRICS.observe('grid_stage_seconds', seconds, stage='render_' + stage)
+            record_render_cost(spec, cost, lane, time.perf_counter() - start, len(data), 'template' in timings)
+            return data, sizes or None
+
+        start = time.perf_counter()
+        pdf_bytes = RENDER_CACHE.get_or_render(key, render)
+        seconds = time.perf_counter() - start
+        with METRICS.time('grid_stage_seconds', stage='send_file'):
+            response = send_file(
+                BytesIO(pdf_bytes),
+                as_attachment=True,
+                download_name=output_filename,
+                mimetype='application/pdf',
+                etag=etag
+            )
+        if response.status_code == 200:
+            REQUEST_LOG.record(spec, seconds, len(pdf_bytes), cached=not rendered)
+        set_stream_size_headers(response, RENDER_CACHE.meta(key))
+    response.set_etag(etag)
+    # Increment the PDF count, once per download rather than per resumed range
+    if response.status_code == 200:
+        with METRICS.time('grid_stage_seconds', stage='counter'):
+            increment_pdf_count()
+    return response
+
+@app.context_processor
+def inject_grid_types():
+    """Make the grid type choices available to every template."""
+    return {'grid_types': grid_types.GRID_TYPE_LABELS}
+
+_index_shell = None
+
+def index_shell():
+    """
+    Return the GET / page and its ETag, rendering the template on first use.
+
+    The page is the form with its default values. The download counter is
+    left empty and filled in by the browser from /count.json, so the page
+    does not change while the app runs.
+
+    Returns:
+        tuple: (HTML bytes, ETag value).
+    """
+    global _index_shell
+    if _index_shell is None:
+        with app.test_request_context('/'):
+            html = render_template('index.html', predefined_sizes=PREDEFINED_SIZE_NAMES, errors=[], messages=[],
+                                   count=None, output_filename="grid_template.pdf")
+        data = html.encode('utf-8')
+        _index_shell = data, hashlib.sha256(data).hexdigest()[:32]
+    return _index_shell
+
+def profiled(view):
+    """
+    Record a sample of the view when PROFILER wants the request.
+
+    The sample is tagged with the request path and response status, and by
+    send_grid_pdf (through g.profile_tags) with the canonical spec, render
+    lane and stage timings. Renders the view starts on a pool are recorded
+    as separate "render" samples by the pool worker. Sheets streamed from
+    the response body are rendered after the view returns and are not
+    covered by the request sample.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.wants(request.headers.get(PROFILE_HEADER)):
+            return view(*args, **kwargs)
+        with PROFILER.sample('request') as tags:
+            if tags is None:
+                return view(*args, **kwargs)
+            tags['path'] = request.full_path
+            g.profile_tags = tags
+            response = app.make_response(view(*args, **kwargs))
+            tags['status'] = response.status_code
+            return response
+    return wrapper
 
 @app.route('/', methods=['GET', 'POST'])
+@profiled
 def index():
     errors = []
     messages = []
-    predefined_size_names = sorted(AVAILABLE_PAPER_SIZES.keys())
-    pdf_count = get_pdf_count()
+    predefined_size_names = PREDEFINED_SIZE_NAMES
 
     if request.method == 'POST':
-        # Retrieve form data
-        paper_size_option = request.form.get('paper_size_option')
-        predefined_size = request.form.get('predefined_size')
-        custom_width_cm = request.form.get('custom_width_cm')
-        custom_height_cm = request.form.get('custom_height_cm')
-        grid_size_mm = request.form.get('grid_size_mm')
-        grid_color = request.form.get('grid_color')
-        background_color = request.form.get('background_color')
-        line_thickness = request.form.get('line_thickness')
-        output_filename = request.form.get('output_filename')
-
-        # Validation
-        # Paper size
-        if paper_size_option == 'predefined':
-            if predefined_size not in AVAILABLE_PAPER_SIZES:
-                errors.append("Selected predefined paper size is not supported.")
-            else:
-                paper_width_pt, paper_height_pt = AVAILABLE_PAPER_SIZES[predefined_size]
-                paper_width_mm = paper_width_pt / mm
-                paper_height_mm = paper_height_pt / mm
-        elif paper_size_option == 'custom':
-            try:
-                custom_width_cm = float(custom_width_cm)
-                custom_height_cm = float(custom_height_cm)
-                if custom_width_cm <= 0 or custom_height_cm <= 0:
-                    errors.append("Custom paper dimensions must be positive numbers.")
-                paper_width_mm = custom_width_cm * 10
-                paper_height_mm = custom_height_cm * 10
-            except ValueError:
-                errors.append("Custom paper dimensions must be valid numbers.")
-        else:
-            errors.append("Invalid paper size option selected.")
+        with METRICS.time('grid_stage_seconds', stage='validate'):
+            spec, output_filename, errors = parse_download_params(request.form)
 
-        # Grid size
+        if errors:
+            # Render the form with errors
+            return render_template('index.html', predefined_sizes=predefined_size_names, errors=errors, messages=messages, count=get_pdf_count(), output_filename=output_filename)
+        
+        count_paper_size(request.form)
         try:
-            grid_size_mm = float(grid_size_mm)
-            if grid_size_mm <= 0:
-                errors.append("Grid size must be a positive number.")
-        except ValueError:
-            errors.append("Grid size must be a valid number.")
+            return send_grid_pdf(spec, output_filename)
+        except (RenderQueueFull, RenderTimeout):
+            raise
+        except Exception as e:
+            METRICS.inc('grid_errors_total', kind='render')
+            errors.append(str(e))
+            return render_template('index.html', predefined_sizes=predefined_size_names, errors=errors, messages=messages, count=get_pdf_count(), output_filename=output_filename)
+
+    # GET request: the pre-rendered form, revalidated by ETag
+    data, etag = index_shell()
+    response = Response(data, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={INDEX_MAX_AGE}'
+    return response.make_conditional(request)
+
+@app.route('/count.json')
+def count_json():
+    """Report the number of generated PDFs for the counter on the index page."""
+    response = jsonify(count=get_pdf_count())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-        # Grid color
-        if not validate_hex_color(grid_color):
-            errors.append("Invalid hex color code for Grid Color.")
+def canonical_query(spec, predefined_size, output_filename):
+    """
+    Return the canonical /grid.pdf query string for a spec.
+
+    Parameters are sorted by name, numbers carry no trailing zeros, colors are
+    uppercase #RRGGBB, and the paper is given either as predefined_size or as
+    custom_width_cm/custom_height_cm. The default filename is left out.
+    """
+    params = {
+        'grid_size_mm': format_pdf_number(spec['grid_size_mm']),
+        'grid_color': spec['grid_color'],
+        'background_color': spec['background_color'],
+        'line_thickness': format_pdf_number(spec['line_thickness']),
+    }
+    if predefined_size:
+        params['predefined_size'] = predefined_size
+    else:
+        params['custom_width_cm'] = format_pdf_number(spec['paper_width_mm'] / 10)
+        params['custom_height_cm'] = format_pdf_number(spec['paper_height_mm'] / 10)
+    if spec['grid_type'] != 'square':
+        params['grid_type'] = spec['grid_type']
+    if spec['compact']:
+        params['compact'] = '1'
+    if spec['pages'] != 1:
+        params['pages'] = str(spec['pages'])
+    if spec['binding_margin_mm']:
+        params['binding_margin_mm'] = format_pdf_number(spec['binding_margin_mm'])
+    if spec['page_numbers']:
+        params['page_numbers'] = '1'
+    if output_filename != "grid_template.pdf":
+        params['output_filename'] = output_filename
+    return urlencode(sorted(params.items()))
+
+@app.route('/grid.pdf')
+@profiled
+def grid_pdf():
+    """
+    Cacheable GET variant of the form download.
 
-        # Background color
-        if not validate_hex_color(background_color):
-            errors.append("Invalid hex color code for Background Color.")
+    Takes the form fields as query parameters; paper_size_option may be left
+    out and is inferred. Requests for a non-canonical URL are redirected to the
+    canonical one, so shared caches store a single copy per spec.
+    """
+    args = query_grid_args(request.args)
+    with METRICS.time('grid_stage_seconds', stage='validate'):
+        spec, output_filename, errors = parse_download_params(args)
+    if errors:
+        return jsonify(errors=errors), 400
+
+    predefined_size = args.get('predefined_size') if args['paper_size_option'] == 'predefined' else None
+    query = canonical_query(spec, predefined_size, output_filename)
+    if request.query_string.decode('latin-1') != query:
+        response = redirect(url_for('grid_pdf') + '?' + query, code=301)
+        response.headers['Cache-Control'] = GRID_PDF_CACHE_CONTROL
+        return response
+
+    count_paper_size(args)
+    response = send_grid_pdf(spec, output_filename)
+    response.headers['Cache-Control'] = GRID_PDF_CACHE_CONTROL
+    return response
+
+@app.route('/preview.<fmt>')
+def grid_preview(fmt):
+    """
+    Screen-sized SVG or PNG preview for the current form parameters.
 
-        # Line thickness
+    Takes the same query parameters as /grid.pdf. Previews are drawn from the
+    same geometry as the PDF, decimated for screen size, cached by canonical
+    spec, and do not count as generated PDFs.
+    """
+    renderers = {'svg': (preview.render_svg, 'image/svg+xml'), 'png': (preview.render_png, 'image/png')}
+    if fmt not in renderers:
+        return jsonify(errors=["Preview format must be svg or png."]), 404
+    render, mimetype = renderers[fmt]
+    spec, _, errors = parse_grid_params(query_grid_args(request.args))
+    if errors:
+        return jsonify(errors=errors), 400
+
+    etag = spec_etag(spec) + '-' + fmt
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
         try:
-            line_thickness = float(line_thickness)
-            if line_thickness <= 0:
-                errors.append("Line thickness must be a positive number.")
-        except ValueError:
-            errors.append("Line thickness must be a valid number.")
-
-        # Output filename
-        if not output_filename.strip():
-            output_filename = "grid_template.pdf"
-        elif not output_filename.lower().endswith('.pdf'):
-            output_filename += '.pdf'
+            data = PREVIEW_CACHE.get_or_render(fmt + ':' + spec_key(spec), lambda: (render(spec), None))
+        except RuntimeError as e:
+            return jsonify(errors=[str(e)]), 501
+        response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+def hold_batch_slot():
+    """
+    Track when a batch that acquired a _batch_slots slot may release it.
+
+    Returns:
+        tuple: (submit, release). submit(fn, *args) queues a render on
+        BATCH_POOL. release is called once the response is closed; the slot
+        is freed when that has happened and every submitted render has
+        finished or been cancelled.
+    """
+    lock = threading.Lock()
+    # The response, plus one per unfinished render
+    holders = [1]
+
+    def release():
+        with lock:
+            holders[0] -= 1
+            idle = holders[0] == 0
+        if idle:
+            _batch_slots.release()
+
+    def submit(fn, *args):
+        future = BATCH_POOL.submit(fn, *args)
+        with lock:
+            holders[0] += 1
+        future.add_done_callback(lambda _: release())
+        return future
+
+    return submit, release
 
+@app.route('/batch', methods=['POST'])
+def batch_zip():
+    """
+    Render many grid specs and stream them back as a ZIP archive.
+
+    The body is a JSON list of objects with the same fields as the form (or an
+    object with that list under "specs"). Specs are validated up front; if any
+    is invalid, a 400 response lists the errors per spec index. A batch
+    estimated to take longer than BATCH_MAX_SECONDS is rejected with a 400,
+    and one arriving while BATCH_CONCURRENCY batches are running gets a 503.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('specs')
+    if not isinstance(payload, list) or not payload:
+        return jsonify(errors=["Request body must be a non-empty JSON list of grid specs."]), 400
+    if len(payload) > BATCH_MAX_SPECS:
+        return jsonify(errors=[f"A batch may contain at most {BATCH_MAX_SPECS} specs."]), 400
+
+    jobs = []
+    invalid = {}
+    for position, item in enumerate(payload):
+        if not isinstance(item, dict):
+            invalid[position] = ["Grid spec must be a JSON object."]
+            continue
+        spec, output_filename, errors = parse_download_params(item)
         if errors:
-            # Render the form with errors
-            return render_template('index.html', predefined_sizes=predefined_size_names, errors=errors, messages=messages, count=pdf_count, output_filename=output_filename)
-        
-        # Generate PDF
-        try:
-            pdf_buffer = create_grid_pdf(
-                paper_width_mm=paper_width_mm,
-                paper_height_mm=paper_height_mm,
-                grid_size_mm=grid_size_mm,
-                grid_color=grid_color,
-                background_color=background_color,
-                line_thickness=line_thickness
-            )
-            # Increment the PDF count
-            increment_pdf_count()
-            pdf_count += 1  # Update the count for display
-            return send_file(
-                pdf_buffer,
-                as_attachment=True,
-                download_name=output_filename,
-                mimetype='application/pdf'
-            )
-        except Exception as e:
-            errors.append(str(e))
-            return render_template('index.html', predefined_sizes=predefined_size_names, errors=errors, messages=messages, count=pdf_count, output_filename=output_filename)
+            invalid[position] = errors
+        else:
+            jobs.append((output_filename, spec))
+    if invalid:
+        return jsonify(errors=invalid), 400
+    estimated_seconds = sum(cost_model.estimate(spec)['render_seconds'] for _, spec in jobs) / max(1, BATCH_WORKERS)
+    if estimated_seconds > BATCH_MAX_SECONDS:
+        METRICS.inc('grid_errors_total', kind='budget')
+        return jsonify(errors=[f"This batch would take about {estimated_seconds:.0f} seconds to render; the limit "
+                               f"is {BATCH_MAX_SECONDS:g} seconds. Split it into smaller batches."]), 400
+    if not _batch_slots.acquire(blocking=False):
+        raise RenderQueueFull(BATCH_POOL.retry_after)
+    submit, release_slot = hold_batch_slot()
+    for item in payload:
+        count_paper_size(item)
+
+    def entries():
+        names = batch.unique_names(name for name, _ in jobs)
+        pending = []
+        for name, (_, spec) in zip(names, jobs):
+            data = RENDER_CACHE.get(spec_key(spec))
+            if data is None:
+                pending.append((name, spec))
+            else:
+                yield name, data
+        window = BATCH_POOL.max_pending // BATCH_CONCURRENCY
+        for (name, spec), data in batch.render_as_completed(pending, render_spec, max_workers=BATCH_WORKERS,
+                                                            window=window, submit=submit):
+            RENDER_CACHE.put(spec_key(spec), data)
+            yield name, data
+        increment_pdf_count(len(jobs))
+
+    response = Response(
+        stream_with_context(batch.stream_zip(entries())),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename="grid_templates.zip"'}
+    )
+    # Hold the slot until the archive has been sent or the client went away,
+    # and the renders still running for it have finished
+    response.call_on_close(release_slot)
+    return response
+
+@app.errorhandler(RenderQueueFull)
+@app.errorhandler(RenderTimeout)
+def render_unavailable(error):
+    """Tell clients to back off while the render pool is saturated."""
+    METRICS.inc('grid_errors_total', kind='unavailable')
+    response = jsonify(errors=[str(error)])
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Expose render cache hit/miss and coalescing counters for this worker."""
+    return jsonify(RENDER_CACHE.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose metrics aggregated across all workers in Prometheus text format."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+def check_profile_access():
+    """
+    Abort unless the request carries the profiling token.
+
+    Samples contain specs, code paths and allocation sites, so they are never
+    public: without a configured token the endpoints answer 404, and without
+    the right token 403.
+    """
+    if not PROFILER.token:
+        abort(404)
+    if not PROFILER.authorized(request.headers.get(PROFILE_HEADER)):
+        abort(403)
+
+@app.route('/profiles')
+def profiles():
+    """
+    List the slowest kept profiling samples of all workers, slowest first.
+
+    Query parameters: limit (default 20) and kind ("request" or "render").
+    Each summary's id names its files under /profiles/.
+    """
+    check_profile_access()
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(samples=PROFILER.slowest(limit=limit, kind=request.args.get('kind')))
 
-    # GET request
-    output_filename = "grid_template.pdf"
-    return render_template('index.html', predefined_sizes=predefined_size_names, errors=errors, messages=messages, count=pdf_count, output_filename=output_filename)
+@app.route('/profiles/<sample_id>.<any(prof, tracemalloc, json):fmt>')
+def profile_file(sample_id, fmt):
+    """Download a sample's cProfile stats, tracemalloc snapshot or summary."""
+    check_profile_access()
+    return send_from_directory(PROFILER.directory, f"{sample_id}.{fmt}", as_attachment=True)
 
 if __name__ == "__main__":
     init_db()
+    warm_render_cache()
+    start_prewarm_thread()
     port = int(os.environ.get("PORT", 5010))  # Default to 5000 if PORT isn't set
     app.run(host='0.0.0.0', port=port)
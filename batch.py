@@ -0,0 +1,114 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that collects written chunks."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def stream_zip(entries):
+    """
+    Build a ZIP archive incrementally.
+
+    Because the underlying file is not seekable, zipfile writes each entry
+    followed by a data descriptor, so an entry's bytes can be released as soon
+    as it has been added. PDFs are already compressed, so entries are stored.
+
+    Parameters:
+    - entries (iterable): (name, bytes) pairs, consumed lazily.
+
+    Yields:
+        bytes: Consecutive chunks of the archive.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            archive.writestr(info, data)
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def unique_names(names):
+    """Return names with "-2", "-3", ... inserted before the extension of repeats."""
+    seen = set()
+    result = []
+    for name in names:
+        candidate = name
+        stem, ext = os.path.splitext(name)
+        n = 1
+        while candidate in seen:
+            n += 1
+            candidate = f"{stem}-{n}{ext}"
+        seen.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def render_as_completed(jobs, render, max_workers, window=None, submit=None):
+    """
+    Render jobs in a process pool and yield results in completion order.
+
+    At most window jobs are in flight at once, so the number of finished but
+    not yet consumed documents held in memory stays bounded regardless of the
+    batch size.
+
+    Parameters:
+    - jobs (list): (name, spec) pairs.
+    - render (callable): Picklable function mapping a spec to bytes.
+    - max_workers (int): Number of worker processes.
+    - window (int): Maximum jobs in flight; defaults to twice max_workers.
+    - submit (callable): submit(render, spec) returning a Future, for running
+      on a shared pool. By default a pool of max_workers processes is
+      started for the jobs and shut down afterwards.
+
+    Yields:
+        tuple: ((name, spec), bytes) for each finished job.
+    """
+    if not jobs:
+        return
+    max_workers = max(1, min(max_workers, len(jobs)))
+    window = window or 2 * max_workers
+    queued = iter(jobs)
+    in_flight = {}
+    executor = None
+    if submit is None:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        submit = executor.submit
+    try:
+        for job in queued:
+            in_flight[submit(render, job[1])] = job
+            if len(in_flight) >= window:
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                yield job, future.result()
+                next_job = next(queued, None)
+                if next_job is not None:
+                    in_flight[submit(render, next_job[1])] = next_job
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            # Leave the shared pool to other callers
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,73 @@
+"""
+Measure import-to-first-response time of the app in fresh interpreters.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs N] [--warm]
+
+Each run starts a new Python process in an empty working directory with an
+empty render cache, imports app, and times the first GET / and the first
+/grid.pdf download through Flask's test client. With --warm, the render
+cache is warmed (as gunicorn.conf.py does) between import and the requests.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import sys, time, json
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+warm = sys.argv[1] == '1'
+if warm:
+    app.warm_render_cache()
+warmed = time.perf_counter()
+client = app.app.test_client()
+index = client.get('/')
+first_index = time.perf_counter()
+pdf = client.get('/grid.pdf?background_color=%23FFFFFF&grid_color=%23B7C9EE&grid_size_mm=5'
+                 '&line_thickness=0.3&predefined_size=A4')
+first_pdf = time.perf_counter()
+assert index.status_code == 200 and pdf.status_code == 200, (index.status_code, pdf.status_code)
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'warm_ms': (warmed - imported) * 1000,
+    'index_ms': (first_index - warmed) * 1000,
+    'pdf_ms': (first_pdf - first_index) * 1000,
+    'total_ms': (first_pdf - start) * 1000,
+    'reportlab_loaded': 'reportlab' in sys.modules,
+}))
+"""
+
+
+def run_once(warm):
+    """Run one cold start in a fresh process and return its timings."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=ROOT, GRID_CACHE_DIR=os.path.join(workdir, 'cache'),
+                   GRID_METRICS_DIR=os.path.join(workdir, 'metrics'), GRID_LOG_LEVEL='WARNING')
+        output = subprocess.run([sys.executable, '-c', CHILD, '1' if warm else '0'], cwd=workdir, env=env,
+                                check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to measure; medians are reported")
+    parser.add_argument("--warm", action="store_true", help="warm the render cache before the first request")
+    args = parser.parse_args()
+
+    runs = [run_once(args.warm) for _ in range(args.runs)]
+    for name in ('import_ms', 'warm_ms', 'index_ms', 'pdf_ms', 'total_ms'):
+        values = [run[name] for run in runs]
+        print(f"{name:<10} median {statistics.median(values):>8.1f}  min {min(values):>8.1f}  max {max(values):>8.1f}")
+    print(f"reportlab imported: {any(run['reportlab_loaded'] for run in runs)}")
+
+
+if __name__ == "__main__":
+    main()
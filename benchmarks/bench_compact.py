@@ -0,0 +1,60 @@
+"""
+Compare standard and compact output sizes across paper sizes and grid types.
+
+Usage:
+    python benchmarks/bench_compact.py [--engine native|reportlab] [--grid-size MM]
+
+For each paper size and grid type, prints the file size and the content
+stream size before and after compression (the same numbers /grid.pdf reports
+in X-Grid-Stream-Bytes and X-Grid-Stream-Compressed-Bytes) in both modes.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grids import create_grid_pdf
+from grid_types import GRID_TYPES
+
+# (label, width mm, height mm)
+PAPER_SIZES = [
+    ("A5", 148, 210),
+    ("A4", 210, 297),
+    ("A3", 297, 420),
+    ("A1", 594, 841),
+    ("A0", 841, 1189),
+]
+
+
+def render(width_mm, height_mm, grid_size_mm, grid_type, engine, compact):
+    """Return (milliseconds, file bytes, stream sizes) for one render."""
+    sizes = {}
+    start = time.perf_counter()
+    data = create_grid_pdf(width_mm, height_mm, grid_size_mm, engine=engine, grid_type=grid_type,
+                           compact=compact, sizes=sizes).read()
+    return (time.perf_counter() - start) * 1000, len(data), sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--engine", choices=["native", "reportlab"], default="native")
+    parser.add_argument("--grid-size", type=float, default=5, help="grid size in mm")
+    args = parser.parse_args()
+
+    print(f"{'paper':<6} {'type':<10} {'mode':<9} {'ms':>8} {'bytes':>10} {'stream':>10} {'deflated':>10}")
+    for label, width_mm, height_mm in PAPER_SIZES:
+        for grid_type in GRID_TYPES:
+            results = {}
+            for mode, compact in (("standard", False), ("compact", True)):
+                ms, size, sizes = results[mode] = render(width_mm, height_mm, args.grid_size, grid_type,
+                                                         args.engine, compact)
+                print(f"{label:<6} {grid_type:<10} {mode:<9} {ms:>8.1f} {size:>10} "
+                      f"{sizes.get('stream_bytes', '-'):>10} {sizes.get('compressed_bytes', '-'):>10}")
+            saved = 1 - results["compact"][1] / results["standard"][1]
+            print(f"{label:<6} {grid_type:<10} {'saved':<9} {'':>8} {saved:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
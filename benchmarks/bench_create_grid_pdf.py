@@ -0,0 +1,92 @@
+"""
+Sweep create_grid_pdf over paper sizes and grid pitches.
+
+Records the best render time, the tracemalloc peak and the output size for
+every entry of AVAILABLE_PAPER_SIZES crossed with the grid pitches, plus a few
+custom extremes. Page templates are turned off, so every repeat is a full
+render.
+
+Usage:
+    python benchmarks/bench_create_grid_pdf.py [--engine native|reportlab] [--repeat N]
+        [--pitches 0.5,1,2,5,10,20] [--sizes A4,LETTER] [--json out.json] [--compare old.json]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import results
+from grids import AVAILABLE_PAPER_SIZES, create_grid_pdf
+from gridpdf import MM
+
+DEFAULT_PITCHES = [0.5, 1, 2, 5, 10, 20]
+
+# (label, width mm, height mm, grid size mm)
+CUSTOM_EXTREMES = [
+    ("custom 1x1cm 0.1mm", 10, 10, 0.1),
+    ("custom 10x500cm 1mm", 100, 5000, 1),
+    ("custom 200x200cm 0.5mm", 2000, 2000, 0.5),
+    ("custom 500x500cm 1mm", 5000, 5000, 1),
+]
+
+
+def measure(width_mm, height_mm, grid_size_mm, engine, repeat):
+    """Return (best seconds, peak traced bytes, output bytes) for one case."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        create_grid_pdf(width_mm, height_mm, grid_size_mm, engine=engine, templates=False)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Memory is traced in a separate run; tracing slows rendering down.
+    tracemalloc.start()
+    buffer = create_grid_pdf(width_mm, height_mm, grid_size_mm, engine=engine, templates=False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(buffer.read())
+
+
+def cases(sizes, pitches):
+    for name in sizes:
+        width_pt, height_pt = AVAILABLE_PAPER_SIZES[name]
+        for pitch in pitches:
+            yield f"{name} {pitch:g}mm", width_pt / MM, height_pt / MM, pitch
+    yield from CUSTOM_EXTREMES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--engine", default="native", choices=["native", "reportlab"])
+    parser.add_argument("--repeat", type=int, default=3, help="timed renders per case; the best is reported")
+    parser.add_argument("--pitches", default=",".join(f"{p:g}" for p in DEFAULT_PITCHES),
+                        help="comma-separated grid sizes in mm")
+    parser.add_argument("--sizes", default=None, help="comma-separated paper size names (default: all)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="compare against a results file from another commit")
+    args = parser.parse_args()
+
+    pitches = [float(p) for p in args.pitches.split(",")]
+    sizes = args.sizes.split(",") if args.sizes else sorted(AVAILABLE_PAPER_SIZES)
+
+    rows = []
+    print(f"{'case':<28} {'ms':>9} {'peak KiB':>10} {'bytes':>10}")
+    for label, width_mm, height_mm, pitch in cases(sizes, pitches):
+        seconds, peak, size = measure(width_mm, height_mm, pitch, args.engine, args.repeat)
+        rows.append({"case": label, "ms": seconds * 1000, "peak_bytes": peak, "bytes": size})
+        print(f"{label:<28} {seconds * 1000:>9.2f} {peak / 1024:>10.1f} {size:>10}")
+
+    total_ms = sum(row["ms"] for row in rows)
+    print(f"\n{len(rows)} cases, {total_ms:.1f} ms total render time ({args.engine})")
+
+    if args.json:
+        results.save(args.json, f"create_grid_pdf[{args.engine}]", rows)
+    if args.compare:
+        results.compare(args.compare, rows, ["ms", "peak_bytes", "bytes"])
+
+
+if __name__ == "__main__":
+    main()
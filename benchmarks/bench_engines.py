@@ -0,0 +1,94 @@
+"""
+Compare the native grid PDF writer with the ReportLab engine.
+
+Usage:
+    python benchmarks/bench_engines.py [--repeat N] [--check]
+
+With --check, both outputs are rasterized with PyMuPDF (pip install pymupdf)
+and compared pixel by pixel; the script exits with status 1 if any channel
+differs by more than MAX_PIXEL_DIFFERENCE. tests/test_render.py runs the
+same comparison for every grid type.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grids import create_grid_pdf
+
+# (label, width mm, height mm, grid size mm, grid color, background color, thickness)
+CASES = [
+    ("A4 5mm", 210, 297, 5, "#B7C9EE", "#FFFFFF", 0.3),
+    ("A4 1mm", 210, 297, 1, "#B7C9EE", "#FFFFFF", 0.3),
+    ("LETTER 5mm", 215.9, 279.4, 5, "#000000", "#FFFFCC", 0.5),
+    ("A0 5mm", 841, 1189, 5, "#B7C9EE", "#FFFFFF", 0.3),
+    ("A0 1mm", 841, 1189, 1, "#B7C9EE", "#FFFFFF", 0.3),
+]
+
+ENGINES = ["reportlab", "native"]
+
+# Anti-aliased edges differ slightly between the engines' path coordinates
+MAX_PIXEL_DIFFERENCE = 32
+
+
+def time_render(case, engine, repeat):
+    """Return (best seconds, PDF bytes) over repeat renders."""
+    _, width_mm, height_mm, grid_size_mm, grid_color, background_color, thickness = case
+    best = None
+    data = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = create_grid_pdf(width_mm, height_mm, grid_size_mm, grid_color, background_color,
+                               thickness, engine=engine, templates=False).read()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data
+
+
+def max_pixel_difference(first, second, dpi=72):
+    """Rasterize two one-page PDFs and return the largest channel difference."""
+    import pymupdf
+
+    pixmaps = []
+    for data in (first, second):
+        document = pymupdf.open(stream=data, filetype="pdf")
+        pixmaps.append(document[0].get_pixmap(dpi=dpi, alpha=False))
+    a, b = pixmaps
+    if (a.width, a.height) != (b.width, b.height):
+        return 255
+    return max((abs(x - y) for x, y in zip(a.samples, b.samples)), default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="renders per case; the best time is reported")
+    parser.add_argument("--check", action="store_true", help="rasterize both outputs and compare them")
+    args = parser.parse_args()
+
+    failed = 0
+    print(f"{'case':<11} {'engine':<10} {'ms':>9} {'bytes':>10}")
+    for case in CASES:
+        label = case[0]
+        results = {engine: time_render(case, engine, args.repeat) for engine in ENGINES}
+        for engine in ENGINES:
+            seconds, data = results[engine]
+            print(f"{label:<11} {engine:<10} {seconds * 1000:>9.2f} {len(data):>10}")
+        (rl_s, rl_data), (native_s, native_data) = results["reportlab"], results["native"]
+        line = f"{label:<11} {'speedup':<10} {rl_s / native_s:>8.1f}x {len(native_data) / len(rl_data):>9.0%}"
+        if args.check:
+            difference = max_pixel_difference(rl_data, native_data)
+            line += f"  max pixel diff {difference}"
+            if difference > MAX_PIXEL_DIFFERENCE:
+                line += "  FAIL"
+                failed += 1
+        print(line)
+    if failed:
+        print(f"{failed} cases differ by more than {MAX_PIXEL_DIFFERENCE}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
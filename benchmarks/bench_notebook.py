@@ -0,0 +1,59 @@
+"""
+Show how render time and file size grow with the page count of notebooks.
+
+Usage:
+    python benchmarks/bench_notebook.py [--engine native|reportlab] [--repeat N]
+
+Each page reuses the grid drawn once as a form, so both columns should stay
+nearly flat; "naive" estimates the cost of repeating the single-page drawing.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grids import create_grid_pdf
+
+PAGE_COUNTS = [1, 2, 10, 50, 100, 500]
+
+# (label, width mm, height mm, grid size mm, grid type)
+CASES = [
+    ("A4 5mm square", 210, 297, 5, "square"),
+    ("A4 2mm dot", 210, 297, 2, "dot"),
+]
+
+
+def time_render(case, pages, engine, repeat):
+    """Return (best seconds, PDF bytes) over repeat renders."""
+    _, width_mm, height_mm, grid_size_mm, grid_type = case
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        buffer = create_grid_pdf(width_mm, height_mm, grid_size_mm, engine=engine, grid_type=grid_type,
+                                 pages=pages, binding_margin_mm=10, page_numbers=True)
+        elapsed = time.perf_counter() - start
+        size = len(buffer.read())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--engine", choices=["native", "reportlab"], default="native")
+    parser.add_argument("--repeat", type=int, default=3, help="renders per case; the best time is reported")
+    args = parser.parse_args()
+
+    print(f"{'case':<14} {'pages':>6} {'ms':>9} {'bytes':>10} {'naive ms':>10} {'naive bytes':>12}")
+    for case in CASES:
+        single_s, single_b = time_render(case, 1, args.engine, args.repeat)
+        for pages in PAGE_COUNTS:
+            seconds, size = time_render(case, pages, args.engine, args.repeat)
+            print(f"{case[0]:<14} {pages:>6} {seconds * 1000:>9.1f} {size:>10} "
+                  f"{single_s * pages * 1000:>10.1f} {single_b * pages:>12}")
+
+
+if __name__ == "__main__":
+    main()
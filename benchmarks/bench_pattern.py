@@ -0,0 +1,57 @@
+"""
+Compare tiling-pattern output with explicit-line output across grid densities.
+
+Usage:
+    python benchmarks/bench_pattern.py [--repeat N]
+
+Renders A0 sheets from coarse to very fine grids with render_mode="path"
+and render_mode="pattern" and prints render time and file size; pattern
+output should stay flat while path output grows with the number of lines.
+tests/test_render.py checks that both outputs line up at the page edges.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grids import create_grid_pdf
+
+A0 = (841, 1189)
+
+GRID_SIZES_MM = [20, 10, 5, 2, 1, 0.5]
+
+GRID_TYPES = ["square", "dot", "ruled"]
+
+
+def time_render(width_mm, height_mm, grid_size_mm, grid_type, mode, repeat):
+    """Return (best seconds, output bytes) over repeat renders."""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        buffer = create_grid_pdf(width_mm, height_mm, grid_size_mm, grid_type=grid_type, render_mode=mode,
+                                 templates=False)
+        elapsed = time.perf_counter() - start
+        size = len(buffer.read())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="renders per case; the best time is reported")
+    args = parser.parse_args()
+
+    print(f"{'A0 grid':<14} {'path ms':>9} {'path bytes':>11} {'pattern ms':>11} {'pattern bytes':>14}")
+    for grid_type in GRID_TYPES:
+        for grid_size_mm in GRID_SIZES_MM:
+            path_s, path_b = time_render(*A0, grid_size_mm, grid_type, "path", args.repeat)
+            pattern_s, pattern_b = time_render(*A0, grid_size_mm, grid_type, "pattern", args.repeat)
+            label = f"{grid_size_mm:g}mm {grid_type}"
+            print(f"{label:<14} {path_s * 1000:>9.1f} {path_b:>11} {pattern_s * 1000:>11.2f} {pattern_b:>14}")
+
+
+if __name__ == "__main__":
+    main()
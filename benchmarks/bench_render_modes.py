@@ -0,0 +1,57 @@
+"""
+Compare the single-path and per-line render modes of create_grid_pdf.
+
+Usage:
+    python benchmarks/bench_render_modes.py [--repeat N]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grids import create_grid_pdf
+
+# (label, width mm, height mm, grid size mm)
+CASES = [
+    ("A4 5mm", 210, 297, 5),
+    ("A4 1mm", 210, 297, 1),
+    ("A0 5mm", 841, 1189, 5),
+    ("A0 1mm", 841, 1189, 1),
+]
+
+MODES = ["lines", "path"]
+
+
+def time_render(width_mm, height_mm, grid_size_mm, mode, repeat):
+    """Return (best seconds, output bytes) over repeat renders."""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        buffer = create_grid_pdf(width_mm, height_mm, grid_size_mm, render_mode=mode, templates=False)
+        elapsed = time.perf_counter() - start
+        size = len(buffer.read())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="renders per case; the best time is reported")
+    args = parser.parse_args()
+
+    print(f"{'case':<10} {'mode':<6} {'ms':>9} {'bytes':>10}")
+    for label, width_mm, height_mm, grid_size_mm in CASES:
+        results = {}
+        for mode in MODES:
+            results[mode] = time_render(width_mm, height_mm, grid_size_mm, mode, args.repeat)
+            seconds, size = results[mode]
+            print(f"{label:<10} {mode:<6} {seconds * 1000:>9.1f} {size:>10}")
+        (line_s, line_b), (path_s, path_b) = results["lines"], results["path"]
+        print(f"{label:<10} {'gain':<6} {line_s / path_s:>8.2f}x {path_b / line_b:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Time color and thickness variants written from page templates against full renders.
+
+Usage:
+    python benchmarks/bench_templates.py [--repeat N]
+
+For each paper size, grid size and grid type, a PageTemplate is written once
+and then rendered with several styles (grid color, background and line
+thickness), and each variant is timed against a full render of the same
+style by gridpdf's streaming writer. tests/test_templates.py checks that
+both produce the same bytes.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gridpdf
+from grids import grid_type_style, iter_grid_type_geometry
+
+# (label, width mm, height mm, grid size mm, grid type)
+CASES = [
+    ("A4 5mm square", 210, 297, 5, "square"),
+    ("A4 1mm square", 210, 297, 1, "square"),
+    ("A3 5mm dot", 297, 420, 5, "dot"),
+    ("A4 5mm hex", 210, 297, 5, "hex"),
+    ("A4 5mm isometric", 210, 297, 5, "isometric"),
+    ("LETTER 6.35mm ruled", 215.9, 279.4, 6.35, "ruled"),
+]
+
+# (grid color, background color, line thickness)
+STYLES = [
+    ("#B7C9EE", "#FFFFFF", 0.3),
+    ("#000000", "#FFFFFF", 1),
+    ("#FF8800", "#FFFFE0", 0.25),
+    ("#336699", "#F0F0F0", 0.5),
+]
+
+
+def best_of(repeat, function):
+    """Return (best seconds, result) over repeat calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement; the best time is reported")
+    args = parser.parse_args()
+
+    print(f"{'case':<20} {'compact':<8} {'template ms':>12} {'full ms':>9} {'variant us':>11} {'bytes':>9}")
+    for label, width_mm, height_mm, grid_size_mm, grid_type in CASES:
+        width, height, pitch = width_mm * gridpdf.MM, height_mm * gridpdf.MM, grid_size_mm * gridpdf.MM
+        for compact in (False, True):
+            template_s, template = best_of(args.repeat, lambda: gridpdf.page_template(
+                width, height, iter_grid_type_geometry(width, height, pitch, grid_type, compact)))
+            full_total = variant_total = 0
+            for grid_color, background_color, thickness in STYLES:
+                style = grid_type_style(width, height, grid_color, background_color, thickness, grid_type, compact)
+                full_s, _ = best_of(args.repeat, lambda: b"".join(gridpdf.iter_page_pdf(
+                    width, height, iter_grid_type_geometry(width, height, pitch, grid_type, compact), style=style)))
+                variant_s, variant = best_of(args.repeat, lambda: template.render(style))
+                full_total += full_s
+                variant_total += variant_s
+            print(f"{label:<20} {str(compact):<8} {template_s * 1000:>12.2f} {full_total / len(STYLES) * 1000:>9.2f} "
+                  f"{variant_total / len(STYLES) * 1e6:>11.1f} {len(variant):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Drive the download endpoint with concurrent requests and report throughput
+and latency percentiles.
+
+By default requests go through Flask's test client in this process, using a
+throwaway statistics database (download counter and render log) and no
+render cache. With --url the harness targets a running server instead, e.g.
+a local gunicorn:
+
+    gunicorn app:app --workers 4 --bind 127.0.0.1:8000
+    python benchmarks/load_test.py --url http://127.0.0.1:8000
+
+Usage:
+    python benchmarks/load_test.py [--requests N] [--concurrency C] [--mix common|varied]
+        [--url URL] [--json out.json] [--compare old.json]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import results
+
+COMMON_FORM = {
+    "paper_size_option": "predefined",
+    "predefined_size": "A4",
+    "grid_size_mm": "5",
+    "grid_color": "#B7C9EE",
+    "background_color": "#FFFFFF",
+    "line_thickness": "0.3",
+    "output_filename": "grid_template.pdf",
+}
+
+
+def make_form(mix, rng):
+    """Return form data for one request of the given traffic mix."""
+    form = dict(COMMON_FORM)
+    if mix == "varied":
+        form["predefined_size"] = rng.choice(["A4", "A3", "LETTER", "A0"])
+        form["grid_size_mm"] = f"{rng.uniform(1, 10):.2f}"
+        form["line_thickness"] = f"{rng.uniform(0.1, 1):.2f}"
+    return form
+
+
+def local_client():
+    """Return a function posting a form through the Flask test client."""
+    import app
+
+    # Keep the download counter and render log out of the real statistics.db,
+    # so load-test specs are not pre-warmed as popular ones
+    database = os.path.join(tempfile.mkdtemp(), "statistics.db")
+    app.PDF_COUNTER.database = database
+    app.REQUEST_LOG.database = database
+    app.RENDER_CACHE.max_bytes = 0
+    app.RENDER_CACHE.cache_dir = None
+    app.app.logger.setLevel("WARNING")
+    clients = threading.local()
+
+    def post(form):
+        if not hasattr(clients, "client"):
+            clients.client = app.app.test_client()
+        response = clients.client.post("/", data=form)
+        return response.status_code, len(response.data)
+
+    return post
+
+
+def remote_client(url):
+    """Return a function posting a form to a running server."""
+    def post(form):
+        body = urllib.parse.urlencode(form).encode()
+        with urllib.request.urlopen(url, data=body) as response:
+            return response.status, len(response.read())
+
+    return post
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(post, forms, concurrency):
+    """Send every form with concurrency workers; return (elapsed, latencies, failures)."""
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one(form):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            status, _ = post(form)
+            ok = status == 200
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            failures += not ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, forms))
+    return time.perf_counter() - start, sorted(latencies), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="common", choices=["common", "varied"],
+                        help="common repeats the default A4 form; varied randomizes size, pitch and thickness")
+    parser.add_argument("--url", help="target a running server instead of the in-process test client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="compare against a results file from another commit")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    forms = [make_form(args.mix, rng) for _ in range(args.requests)]
+    post = remote_client(args.url) if args.url else local_client()
+
+    elapsed, latencies, failures = run(post, forms, args.concurrency)
+    row = {
+        "case": f"{args.mix} c={args.concurrency}",
+        "requests": len(latencies),
+        "failures": failures,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+    print(f"{row['requests']} requests ({failures} failed) in {elapsed:.2f} s: {row['rps']:.1f} req/s")
+    print(f"latency p50 {row['p50_ms']:.1f} ms, p90 {row['p90_ms']:.1f} ms, "
+          f"p99 {row['p99_ms']:.1f} ms, max {row['max_ms']:.1f} ms")
+
+    if args.json:
+        results.save(args.json, "load_test", [row])
+    if args.compare:
+        results.compare(args.compare, [row], ["rps", "p50_ms", "p90_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
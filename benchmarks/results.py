@@ -0,0 +1,45 @@
+"""Save benchmark results as JSON and compare them across commits."""
+import json
+import subprocess
+
+
+def git_revision():
+    """Return the current short commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path, name, rows):
+    """Write rows (a list of dicts with a "case" key) to path."""
+    with open(path, "w") as f:
+        json.dump({"benchmark": name, "revision": git_revision(), "rows": rows}, f, indent=2)
+
+
+def compare(path, rows, metrics):
+    """
+    Print the relative change of each metric against a saved result file.
+
+    Parameters:
+    - path (str): Result file written by save() on another commit.
+    - rows (list): Current rows.
+    - metrics (list): Numeric keys to compare.
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    previous = {row["case"]: row for row in baseline["rows"]}
+    print(f"\nchange vs {baseline.get('revision') or path}:")
+    print(f"{'case':<28}" + "".join(f"{metric:>16}" for metric in metrics))
+    for row in rows:
+        old = previous.get(row["case"])
+        if old is None:
+            continue
+        cells = []
+        for metric in metrics:
+            if old.get(metric):
+                cells.append(f"{(row[metric] - old[metric]) / old[metric]:>+16.1%}")
+            else:
+                cells.append(f"{'-':>16}")
+        print(f"{row['case']:<28}" + "".join(cells))
@@ -0,0 +1,57 @@
+"""
+Cost estimates for grid renders.
+
+The native writer's cost is linear in the number of primitives drawn (grid
+lines, or dots for dot grids). The coefficients below were fitted to
+native-engine renders of A4 to 500x500 cm sheets with 0.5-10 mm grids (see
+benchmarks/bench_engines.py); the vectorized grid types in grid_types cost
+about the same per primitive. Notebook pages reuse the grid drawn once, so
+each extra page only adds a small page object and content stream. Recalibrate
+them from the "render cost" log lines written by app.py when the writer
+changes, leaving out template=1 lines: those pages were written from a cached
+PageTemplate (see grids.iter_grid_type_pdf) and cost next to nothing.
+"""
+import gridpdf
+import grid_types
+
+# Seconds: fixed overhead plus per grid line
+BASE_SECONDS = 0.0001
+SECONDS_PER_LINE = 0.0000018
+
+# Uncompressed content stream bytes: fixed operators plus per grid line
+BASE_STREAM_BYTES = 80
+STREAM_BYTES_PER_LINE = 32
+
+# Output file bytes (Flate-compressed content stream)
+BASE_FILE_BYTES = 650
+FILE_BYTES_PER_LINE = 6
+
+# Each notebook page after the first (page object and placement stream)
+SECONDS_PER_PAGE = 0.000025
+FILE_BYTES_PER_PAGE = 320
+
+
+def estimate(spec):
+    """
+    Estimate the cost of rendering a canonical spec.
+
+    Returns:
+        dict: lines (primitives drawn), stream_bytes, file_bytes and render_seconds.
+    """
+    extra_pages = spec.get('pages', 1) - 1
+    lines = grid_types.primitive_count(spec.get('grid_type', 'square'), spec['paper_width_mm'] * gridpdf.MM,
+                                       spec['paper_height_mm'] * gridpdf.MM, spec['grid_size_mm'] * gridpdf.MM)
+    return {
+        'lines': lines,
+        'stream_bytes': BASE_STREAM_BYTES + STREAM_BYTES_PER_LINE * lines,
+        'file_bytes': BASE_FILE_BYTES + FILE_BYTES_PER_LINE * lines + FILE_BYTES_PER_PAGE * extra_pages,
+        'render_seconds': BASE_SECONDS + SECONDS_PER_LINE * lines + SECONDS_PER_PAGE * extra_pages,
+    }
+
+
+def over_budget(cost, max_render_seconds, max_file_bytes):
+    """Return an error message if cost exceeds the budgets, otherwise None."""
+    if cost['render_seconds'] > max_render_seconds or cost['file_bytes'] > max_file_bytes:
+        return (f"The requested grid is too detailed ({cost['lines']} lines or dots). "
+                f"Use a larger grid size or a smaller paper size.")
+    return None
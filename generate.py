@@ -0,0 +1,238 @@
+"""
+Render grid PDFs listed in a manifest into a directory, without the web app.
+
+Usage:
+    python generate.py MANIFEST -o OUTPUT_DIR [--workers N] [--force]
+
+The manifest is a CSV file with a header row, or a JSON list of objects (or an
+object with that list under "specs"). Each row uses the same fields as the
+form and the /grid.pdf query string, with the same defaults: either
+predefined_size or custom_width_cm and custom_height_cm, plus optional
+grid_size_mm, grid_color, background_color, line_thickness, grid_type,
+compact, pages, binding_margin_mm, page_numbers and output_filename. Rows
+without an output_filename are named after their spec hash.
+
+Every row is validated before anything is rendered. Documents are rendered in
+a process pool, one worker per core by default, and each file is written to a
+temporary name in the output directory and renamed into place, so readers
+never see a partial PDF. The spec hash and the SHA-256 of every written file
+are recorded in STATE_FILENAME; on the next run, rows whose spec and file are
+unchanged are skipped.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+
+from werkzeug.datastructures import MultiDict
+
+import grids
+import batch
+
+# Written to the output directory: output filename -> spec hash and file SHA-256
+STATE_FILENAME = '.gridgen-state.json'
+
+
+def read_manifest(path):
+    """
+    Read manifest rows as dicts of form field strings.
+
+    Empty CSV cells and JSON nulls are dropped so the defaults apply. JSON
+    booleans become "true" or "", matching the checkbox fields.
+
+    Raises:
+        ValueError: If the manifest is not a CSV file or a JSON list of objects.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as manifest:
+            return [{name: value.strip() for name, value in row.items() if name and value and value.strip()}
+                    for row in csv.DictReader(manifest)]
+    with open(path, encoding='utf-8') as manifest:
+        payload = json.load(manifest)
+    if isinstance(payload, dict):
+        payload = payload.get('specs')
+    if not isinstance(payload, list) or not all(isinstance(item, dict) for item in payload):
+        raise ValueError("A JSON manifest must be a list of grid spec objects.")
+    rows = []
+    for item in payload:
+        row = {}
+        for name, value in item.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = 'true' if value else ''
+            row[name] = str(value)
+        rows.append(row)
+    return rows
+
+
+def plan_jobs(rows):
+    """
+    Validate manifest rows and name their output files.
+
+    The web app's render budgets do not apply: they keep request workers
+    responsive, while a run here may take as long as its sheets need.
+
+    Returns:
+        tuple: (jobs, invalid) where jobs is a list of (filename, spec) pairs
+        and invalid maps row numbers (from 1) to their validation errors.
+    """
+    jobs = []
+    invalid = {}
+    for number, row in enumerate(rows, 1):
+        spec, output_filename, errors = grids.parse_grid_params(grids.query_grid_args(MultiDict(row)),
+                                                                check_budget=False)
+        if errors:
+            invalid[number] = errors
+            continue
+        if not row.get('output_filename'):
+            output_filename = f"grid_{grids.spec_etag(spec)[:12]}.pdf"
+        # Never write outside the output directory
+        jobs.append((os.path.basename(output_filename), spec))
+    names = batch.unique_names(name for name, _ in jobs)
+    return [(name, spec) for name, (_, spec) in zip(names, jobs)], invalid
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as existing:
+            for block in iter(lambda: existing.read(1 << 20), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def write_atomic(path, data):
+    """Write bytes to a temporary file beside path and rename it into place."""
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(data)
+        # mkstemp creates files readable by the owner only
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def render_to_file(task):
+    """
+    Render a spec to a file. Runs in pool worker processes.
+
+    Parameters:
+    - task (tuple): (spec, path).
+
+    Returns:
+        dict: sha256, bytes and seconds of the written file, or error if the
+        render failed.
+    """
+    spec, path = task
+    start = time.perf_counter()
+    try:
+        data = grids.create_grid_pdf(**spec).read()
+        write_atomic(path, data)
+    except Exception as exc:
+        return {'error': f"{type(exc).__name__}: {exc}"}
+    return {'sha256': hashlib.sha256(data).hexdigest(), 'bytes': len(data),
+            'seconds': time.perf_counter() - start}
+
+
+def load_state(output_dir):
+    try:
+        with open(os.path.join(output_dir, STATE_FILENAME), encoding='utf-8') as state:
+            return json.load(state)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(output_dir, state):
+    data = json.dumps(state, indent=1, sort_keys=True).encode('utf-8')
+    write_atomic(os.path.join(output_dir, STATE_FILENAME), data)
+
+
+def generate(jobs, output_dir, workers, force=False):
+    """
+    Render jobs into output_dir, skipping files that are already up to date.
+
+    A job is up to date when the state file records the same spec hash for
+    its filename and the file on disk still has the recorded SHA-256.
+
+    Returns:
+        dict: Counts of rendered, skipped and failed jobs, total bytes written,
+        elapsed seconds, and the errors of failed jobs by filename.
+    """
+    start = time.perf_counter()
+    state = load_state(output_dir)
+    pending = []
+    skipped = 0
+    for name, spec in jobs:
+        etag = grids.spec_etag(spec)
+        recorded = state.get(name)
+        if (not force and recorded and recorded.get('spec') == etag
+                and file_sha256(os.path.join(output_dir, name)) == recorded.get('sha256')):
+            skipped += 1
+        else:
+            pending.append((name, (spec, os.path.join(output_dir, name))))
+
+    rendered = 0
+    written = 0
+    errors = {}
+    try:
+        for (name, (spec, _)), result in batch.render_as_completed(pending, render_to_file, max_workers=workers):
+            if 'error' in result:
+                errors[name] = result['error']
+                state.pop(name, None)
+                continue
+            rendered += 1
+            written += result['bytes']
+            state[name] = {'spec': grids.spec_etag(spec), 'sha256': result['sha256']}
+    finally:
+        # Keep the progress of an interrupted run
+        save_state(output_dir, state)
+    return {'rendered': rendered, 'skipped': skipped, 'failed': len(errors), 'bytes': written,
+            'seconds': time.perf_counter() - start, 'errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("manifest", help="CSV or JSON file listing grid specs")
+    parser.add_argument("-o", "--output-dir", required=True, help="directory the PDFs are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--force", action="store_true", help="render every row, even if unchanged")
+    args = parser.parse_args()
+
+    try:
+        rows = read_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        parser.error(f"cannot read manifest: {exc}")
+    jobs, invalid = plan_jobs(rows)
+    if invalid:
+        for number, errors in sorted(invalid.items()):
+            for error in errors:
+                print(f"row {number}: {error}", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary = generate(jobs, args.output_dir, args.workers, args.force)
+    for name, error in sorted(summary['errors'].items()):
+        print(f"{name}: {error}", file=sys.stderr)
+    seconds = summary['seconds']
+    print(f"{summary['rendered']} rendered, {summary['skipped']} skipped, {summary['failed']} failed "
+          f"in {seconds:.2f} s with {args.workers} workers")
+    if summary['rendered']:
+        print(f"{summary['rendered'] / seconds:.1f} PDFs/s, {summary['bytes'] / seconds / 1e6:.2f} MB/s, "
+              f"{summary['bytes']} bytes written")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
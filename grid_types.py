@@ -0,0 +1,300 @@
+"""
+Vectorized geometry for the supported grid types.
+
+Each grid type computes all of its primitives at once as a NumPy array,
+either segments (x0, y0, x1, y1) or dots (x, y), in points. The arrays are
+rounded to integers in a 1/10**precision pt coordinate space and formatted into
+content stream operators in bulk with a single %-format per block, so a
+dot grid with hundreds of thousands of dots never loops in Python per dot.
+"""
+import math
+
+import numpy as np
+
+from gridpdf import PATTERN_PRECISION, format_pdf_number, hex_to_rgb, page_setup_operators
+
+GRID_TYPES = ('square', 'dot', 'isometric', 'hex', 'ruled', 'cornell')
+
+GRID_TYPE_LABELS = {
+    'square': 'Square',
+    'dot': 'Dot',
+    'isometric': 'Isometric (triangles)',
+    'hex': 'Hexagonal',
+    'ruled': 'Ruled',
+    'cornell': 'Cornell notes',
+}
+
+# Content streams use integer coordinates in 1/10**PRECISION pt units
+PRECISION = 2
+
+# Primitives formatted per content stream chunk
+CHUNK_PRIMITIVES = 16384
+
+# Dots are drawn as round-capped zero-length strokes this many times wider
+# than the line thickness, so the default 0.3 pt gives a 1.2 pt dot.
+DOT_SIZE_FACTOR = 4
+
+# Cornell layout: cue column width and summary area height as page fractions
+CORNELL_CUE_FRACTION = 0.3
+CORNELL_SUMMARY_FRACTION = 0.2
+
+# Grid types whose cell repeats on a square lattice and can therefore be drawn
+# as a tiling pattern (render_mode="pattern")
+PATTERN_TYPES = ('square', 'dot', 'ruled')
+
+SQRT3 = math.sqrt(3)
+
+
+def _steps(length, pitch):
+    return int(length / pitch + 1e-9) + 1
+
+
+def square_segments(width, height, pitch):
+    xs = np.arange(_steps(width, pitch)) * pitch
+    ys = np.arange(_steps(height, pitch)) * pitch
+    vertical = np.column_stack((xs, np.zeros_like(xs), xs, np.full_like(xs, height)))
+    horizontal = np.column_stack((np.zeros_like(ys), ys, np.full_like(ys, width), ys))
+    return np.concatenate((vertical, horizontal))
+
+
+def dot_points(width, height, pitch):
+    xs = np.arange(_steps(width, pitch)) * pitch
+    ys = np.arange(_steps(height, pitch)) * pitch
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    return np.column_stack((grid_x.ravel(), grid_y.ravel()))
+
+
+def ruled_segments(width, height, pitch):
+    ys = np.arange(_steps(height, pitch)) * pitch
+    return np.column_stack((np.zeros_like(ys), ys, np.full_like(ys, width), ys))
+
+
+def cornell_segments(width, height, pitch):
+    # Ruled lines start at the summary divider; the cue column line runs from
+    # there to the top of the page.
+    summary = height * CORNELL_SUMMARY_FRACTION
+    ys = summary + np.arange(_steps(height - summary, pitch)) * pitch
+    ruled = np.column_stack((np.zeros_like(ys), ys, np.full_like(ys, width), ys))
+    cue = width * CORNELL_CUE_FRACTION
+    return np.concatenate((ruled, [[cue, summary, cue, height]]))
+
+
+def isometric_segments(width, height, pitch):
+    # Equilateral triangles with side pitch: horizontal lines plus two families
+    # of 60 degree lines. Lines overshoot the page and are clipped.
+    row = pitch * SQRT3 / 2
+    ys = np.arange(_steps(height, row)) * row
+    horizontal = np.column_stack((np.zeros_like(ys), ys, np.full_like(ys, width), ys))
+    run = height / SQRT3
+    start = -math.ceil(run / pitch) * pitch
+    rising_x = start + np.arange(_steps(width - start, pitch)) * pitch
+    rising = np.column_stack((rising_x, np.zeros_like(rising_x), rising_x + run, np.full_like(rising_x, height)))
+    falling_x = np.arange(_steps(width + run, pitch) + 1) * pitch
+    falling = np.column_stack((falling_x, np.zeros_like(falling_x), falling_x - run, np.full_like(falling_x, height)))
+    return np.concatenate((horizontal, rising, falling))
+
+
+def _hex_edges(cx, cy, pitch):
+    angles = np.radians([0, 60, 120, 180])
+    vx = cx[:, None] + pitch * np.cos(angles)
+    vy = cy[:, None] + pitch * np.sin(angles)
+    edges = [np.column_stack((vx[:, i], vy[:, i], vx[:, i + 1], vy[:, i + 1])) for i in range(3)]
+    return np.concatenate(edges)
+
+
+def hex_segments(width, height, pitch):
+    # Flat-topped hexagons with side pitch. Each hexagon draws its three upper
+    # edges; the lower edges are the upper edges of its neighbours, and an
+    # extra ring of hexagons around the page covers the border.
+    dx = 1.5 * pitch
+    dy = SQRT3 * pitch
+    cols = np.arange(-1, int(width / dx) + 2)
+    rows = np.arange(-1, int(height / dy) + 2)
+    col, row = np.meshgrid(cols, rows)
+    cx = (col * dx).ravel()
+    cy = (row * dy + (col % 2) * dy / 2).ravel()
+    return _hex_edges(cx, cy, pitch)
+
+
+def dot_rows(width, height, pitch):
+    xs = np.arange(_steps(width, pitch)) * pitch
+    ys = np.arange(_steps(height, pitch)) * pitch
+    return np.column_stack((xs, np.zeros_like(xs))), ys
+
+
+def hex_rows(width, height, pitch):
+    dx = 1.5 * pitch
+    dy = SQRT3 * pitch
+    cols = np.arange(-1, int(width / dx) + 2)
+    return _hex_edges(cols * dx, (cols % 2) * dy / 2, pitch), np.arange(-1, int(height / dy) + 2) * dy
+
+
+# grid type -> (primitive kind, geometry function)
+GEOMETRY = {
+    'square': ('segments', square_segments),
+    'dot': ('dots', dot_points),
+    'isometric': ('segments', isometric_segments),
+    'hex': ('segments', hex_segments),
+    'ruled': ('segments', ruled_segments),
+    'cornell': ('segments', cornell_segments),
+}
+
+# Grid types made of identical rows: grid type -> function returning the
+# primitives of the row at y=0 and the y offset of every row. Compact output
+# writes the row once per offset under a translation, so the content stream
+# repeats the same text and Flate reduces each row to a back-reference.
+ROWS = {
+    'dot': dot_rows,
+    'hex': hex_rows,
+}
+
+
+def primitive_count(grid_type, width, height, pitch):
+    """Return the number of segments or dots drawn, without building them."""
+    if grid_type == 'square':
+        return _steps(width, pitch) + _steps(height, pitch)
+    if grid_type == 'dot':
+        return _steps(width, pitch) * _steps(height, pitch)
+    if grid_type == 'ruled':
+        return _steps(height, pitch)
+    if grid_type == 'cornell':
+        return _steps(height * (1 - CORNELL_SUMMARY_FRACTION), pitch) + 1
+    if grid_type == 'isometric':
+        return _steps(height, pitch * SQRT3 / 2) + 2 * (_steps(width + height / SQRT3, pitch) + 1)
+    if grid_type == 'hex':
+        return 3 * (int(width / (1.5 * pitch)) + 3) * (int(height / (SQRT3 * pitch)) + 3)
+    raise ValueError(f"Unknown grid type: {grid_type}")
+
+
+def _format_blocks(primitives, kind, scale, compact):
+    # Round once for the whole array, then format each block with one
+    # %-operation over a flat tuple of ints.
+    coords = np.rint(primitives * scale).astype(np.int64)
+    if compact:
+        # Drop primitives that repeat the previous one after rounding
+        keep = np.ones(len(coords), dtype=bool)
+        keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+        coords = coords[keep]
+    if kind == 'dots':
+        coords = np.concatenate((coords, coords), axis=1)
+    template = "%d %d m %d %d l\n"
+    for start in range(0, len(coords), CHUNK_PRIMITIVES):
+        block = coords[start:start + CHUNK_PRIMITIVES]
+        yield ((template * len(block)) % tuple(block.ravel().tolist())).encode("ascii")
+
+
+def _format_rows(grid_type, kind, width, height, pitch, scale):
+    # The row is formatted once; each copy is stroked under its own
+    # translation since cm cannot appear inside a path.
+    row, offsets = ROWS[grid_type](width, height, pitch)
+    row_text = b"".join(_format_blocks(row, kind, scale, True)) + b"S Q\n"
+    for offset in np.rint(offsets * scale).astype(np.int64).tolist():
+        yield b"q 1 0 0 1 0 %d cm\n" % offset + row_text
+
+
+def line_width(grid_type, line_thickness, precision=PRECISION):
+    """
+    Return the line width operand for a grid type's geometry.
+
+    The width applies in the geometry's integer coordinate space, so it can
+    also be set by operators that run before iter_geometry.
+    """
+    kind, _ = GEOMETRY[grid_type]
+    return line_thickness * (DOT_SIZE_FACTOR if kind == 'dots' else 1) * 10 ** precision
+
+
+def iter_geometry(grid_type, width, height, pitch, line_thickness, precision=PRECISION, compact=False,
+                  set_width=True):
+    """
+    Yield the stroking operators for a grid type, without colors or background.
+
+    The operators clip to the page, switch to the integer coordinate space and
+    restore the graphics state at the end. In compact mode, primitives that
+    round to the same coordinates as their predecessor are dropped, and grid
+    types listed in ROWS are written row by row under a translation. Without
+    set_width, the line width is left to preceding operators (see line_width).
+
+    Yields:
+        bytes: Consecutive pieces of content stream.
+    """
+    kind, geometry = GEOMETRY[grid_type]
+    cap = "1 J\n" if kind == 'dots' else ""
+    scale = 10 ** precision
+    thickness = f"{format_pdf_number(line_width(grid_type, line_thickness, precision))} w\n" if set_width else ""
+    yield (
+        f"q\n0 0 {format_pdf_number(width)} {format_pdf_number(height)} re W n\n"
+        f"{1 / scale:g} 0 0 {1 / scale:g} 0 0 cm\n"
+        f"{thickness}{cap}"
+    ).encode("ascii")
+    if compact and grid_type in ROWS:
+        yield from _format_rows(grid_type, kind, width, height, pitch, scale)
+        yield b"Q\n"
+        return
+    yield from _format_blocks(geometry(width, height, pitch), kind, scale, compact)
+    yield b"S\nQ\n"
+
+
+def iter_content(grid_type, width, height, pitch, grid_color, background_color, line_thickness,
+                 precision=PRECISION, compact=False):
+    """
+    Yield the full page content stream for a grid type.
+
+    Parameters:
+    - grid_type (str): One of GRID_TYPES.
+    - width, height (float): Page size in points.
+    - pitch (float): Grid size in points (hexagon side for "hex").
+    - grid_color, background_color (str): #RRGGBB colors.
+    - line_thickness (float): Line width in points.
+    - precision (int): Decimals kept in coordinates.
+    - compact (bool): Drop redundant operators and primitives.
+
+    Yields:
+        bytes: Consecutive pieces of the content stream.
+    """
+    yield page_setup_operators(width, height, grid_color, background_color, compact).encode("ascii")
+    yield from iter_geometry(grid_type, width, height, pitch, line_thickness, precision, compact)
+
+
+def pattern_content(grid_type, width, height, pitch, grid_color, background_color, line_thickness, compact=False):
+    """
+    Draw a grid as rectangles filled with tiling patterns.
+
+    Each pattern cell holds a single line or dot through the pattern origin,
+    which coincides with the page origin, so the n-th copy lands at n * pitch
+    like the n-th explicit line. Lines run a full pitch either side of the
+    origin: neighbouring copies overlap, so viewers that snap pattern cells to
+    device pixels leave no seams along them. Square grids use one pattern of
+    vertical and one of horizontal lines; each fill rectangle ends just past
+    the half width of the last line that explicit output draws, so no extra
+    line shows at the far edges and the other family still runs to the page
+    edge. The content stream has the same size for every pitch.
+
+    Parameters:
+    - grid_type (str): One of PATTERN_TYPES.
+    - width, height (float): Page size in points.
+    - pitch (float): Grid size in points.
+    - grid_color, background_color (str): #RRGGBB colors.
+    - line_thickness (float): Line width in points.
+    - compact (bool): Drop redundant page setup operators.
+
+    Returns:
+        tuple: (content bytes, patterns) where patterns are (step, cell
+        operators) pairs for gridpdf's writers, pattern i being named /P{i}.
+    """
+    reach = format_pdf_number(pitch, PATTERN_PRECISION)
+    color = " ".join(format_pdf_number(component) for component in hex_to_rgb(grid_color)) + " RG "
+    last_x = (_steps(width, pitch) - 1) * pitch
+    last_y = (_steps(height, pitch) - 1) * pitch
+    if grid_type == 'dot':
+        dot = line_thickness * DOT_SIZE_FACTOR
+        fills = [(f"{color}{format_pdf_number(dot)} w 1 J 0 0 m 0 0 l S",
+                  min(width, last_x + dot / 2), min(height, last_y + dot / 2))]
+    else:
+        thickness = f"{format_pdf_number(line_thickness)} w "
+        vertical = (f"{color}{thickness}0 -{reach} m 0 {reach} l S", min(width, last_x + line_thickness / 2), height)
+        horizontal = (f"{color}{thickness}-{reach} 0 m {reach} 0 l S", width, min(height, last_y + line_thickness / 2))
+        fills = [vertical, horizontal] if grid_type == 'square' else [horizontal]
+    operators = [page_setup_operators(width, height, grid_color, background_color, compact), "/Pattern cs\n"]
+    for index, (_, fill_width, fill_height) in enumerate(fills):
+        operators.append(f"/P{index} scn 0 0 {format_pdf_number(fill_width)} {format_pdf_number(fill_height)} re f\n")
+    return "".join(operators).encode("ascii"), [(pitch, cell) for cell, _, _ in fills]
@@ -0,0 +1,429 @@
+"""
+Minimal PDF writer for grid pages.
+
+A grid page only needs a catalog, a page tree, one page and a content stream,
+so the document can be produced directly without a general purpose PDF
+library. The writer emits the document incrementally: the content stream's
+length is written as an indirect object after the stream, and the
+cross-reference table is emitted last from the offsets recorded on the way.
+A page may also keep its colors and line width in a small style stream
+written just before the cross-reference table, so everything ahead of it can
+be saved once and reused for other styles (see PageTemplate).
+"""
+import zlib
+
+# Points per millimeter
+MM = 72 / 25.4
+
+# Grid lines emitted per content stream chunk
+CHUNK_LINES = 1024
+
+# Notebook pages with page numbers keep a band of this height free at the
+# bottom and print the number centered in it, in Helvetica of this size.
+FOOTER_HEIGHT = 8 * MM
+FOOTER_FONT_SIZE = 8
+
+# Advance width of the Helvetica digits, in text space units per point of size
+HELVETICA_DIGIT_WIDTH = 0.556
+
+
+# Decimals written for coordinates in standard output
+PRECISION = 3
+
+# Decimals written for tiling pattern steps. The viewer places the n-th cell
+# at n times the step, so the step carries more digits than line positions:
+# across an A0 sheet of 0.5 mm cells the error stays below 0.001 pt.
+PATTERN_PRECISION = 6
+
+
+def format_pdf_number(value, precision=PRECISION):
+    """Format a coordinate for a PDF content stream with at most precision decimals."""
+    text = "%.*f" % (precision, value)
+    text = text.rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+def grid_line_positions(length_pt, grid_size_pt):
+    """
+    Return the offsets of the grid lines along one axis, in points.
+
+    Offsets are computed as i * grid_size_pt so rounding error does not
+    accumulate across the sheet; a small tolerance keeps the closing line when
+    the length is an exact multiple of the grid size.
+    """
+    count = int(length_pt / grid_size_pt + 1e-9) + 1
+    return [i * grid_size_pt for i in range(count)]
+
+
+def hex_to_rgb(hex_color):
+    """Convert #RRGGBB to an (r, g, b) tuple in the 0-1 range."""
+    digits = hex_color.lstrip("#")
+    return tuple(int(digits[i:i+2], 16) / 255 for i in (0, 2, 4))
+
+
+def _color_operands(hex_color):
+    return " ".join(format_pdf_number(component) for component in hex_to_rgb(hex_color))
+
+
+def page_setup_operators(paper_width_pt, paper_height_pt, grid_color, background_color, compact=False):
+    """
+    Return the operators that paint the background and set the stroke color.
+
+    In compact mode, operators that only restate the initial graphics state
+    are dropped: a white background (the page is already white) and a black
+    stroke color (the default).
+    """
+    operators = []
+    if not (compact and background_color.upper() == "#FFFFFF"):
+        operators.append(f"{_color_operands(background_color)} rg\n"
+                         f"0 0 {format_pdf_number(paper_width_pt)} {format_pdf_number(paper_height_pt)} re f\n")
+    if not (compact and grid_color.upper() == "#000000"):
+        operators.append(f"{_color_operands(grid_color)} RG\n")
+    return "".join(operators)
+
+
+def style_operators(paper_width_pt, paper_height_pt, grid_color, background_color, line_width, compact=False):
+    """
+    Return the page setup operators followed by the line width.
+
+    These are the only operators of a grid page that depend on its colors and
+    line thickness; the geometry drawn after them does not. A line width of 1
+    (the initial value) is dropped in compact mode.
+    """
+    operators = page_setup_operators(paper_width_pt, paper_height_pt, grid_color, background_color, compact)
+    width = format_pdf_number(line_width)
+    if not (compact and width == "1"):
+        operators += f"{width} w\n"
+    return operators
+
+
+def _unique_positions(positions, precision):
+    # Format each offset once; lines that round to the same position as the
+    # previous one would be drawn twice, so they are skipped.
+    previous = None
+    for text in (format_pdf_number(position, precision) for position in positions):
+        if text != previous:
+            yield text
+        previous = text
+
+
+def iter_grid_content(paper_width_pt, paper_height_pt, grid_size_pt, grid_color, background_color, line_thickness,
+                      precision=PRECISION, compact=False):
+    """
+    Yield the page content stream of a grid in chunks.
+
+    Parameters:
+    - precision (int): Decimals written for line positions.
+    - compact (bool): Drop operators that restate the initial graphics state
+      (see style_operators).
+
+    Yields:
+        bytes: Consecutive pieces of the content stream.
+    """
+    yield style_operators(paper_width_pt, paper_height_pt, grid_color, background_color, line_thickness,
+                          compact).encode("ascii")
+    yield from iter_grid_lines(paper_width_pt, paper_height_pt, grid_size_pt, precision)
+
+
+def iter_grid_lines(paper_width_pt, paper_height_pt, grid_size_pt, precision=PRECISION):
+    """
+    Yield the path of a grid's lines and the stroke, without colors or line width.
+
+    Yields:
+        bytes: Consecutive pieces of the content stream.
+    """
+    width = format_pdf_number(paper_width_pt, precision)
+    height = format_pdf_number(paper_height_pt, precision)
+    operators = []
+    for x in _unique_positions(grid_line_positions(paper_width_pt, grid_size_pt), precision):
+        operators.append(f"{x} 0 m {x} {height} l\n")
+        if len(operators) >= CHUNK_LINES:
+            yield "".join(operators).encode("ascii")
+            operators = []
+    for y in _unique_positions(grid_line_positions(paper_height_pt, grid_size_pt), precision):
+        operators.append(f"0 {y} m {width} {y} l\n")
+        if len(operators) >= CHUNK_LINES:
+            yield "".join(operators).encode("ascii")
+            operators = []
+    operators.append("S\n")
+    yield "".join(operators).encode("ascii")
+
+
+def _deflate(chunks, sizes):
+    compressor = zlib.compressobj(6)
+    for chunk in chunks:
+        sizes["stream_bytes"] += len(chunk)
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _counted(chunks, sizes):
+    for chunk in chunks:
+        sizes["stream_bytes"] += len(chunk)
+        yield chunk
+
+
+class _PdfEmitter:
+    """Track byte offsets of the objects in a PDF written front to back."""
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = []
+
+    def emit(self, data):
+        self.position += len(data)
+        return data
+
+    def begin_object(self, number):
+        # Objects must be started in increasing order: 1, 2, 3, ...
+        assert number == len(self.offsets) + 1
+        self.offsets.append(self.position)
+        return self.emit(f"{number} 0 obj\n".encode("ascii"))
+
+    def write_object(self, number, body):
+        return self.begin_object(number) + self.emit(f"{body}\nendobj\n".encode("ascii"))
+
+    def trailer(self, root):
+        xref_position = self.position
+        lines = [f"xref\n0 {len(self.offsets) + 1}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{offset:010d} 00000 n \n" for offset in self.offsets)
+        lines.append(f"trailer\n<< /Size {len(self.offsets) + 1} /Root {root} 0 R >>\n")
+        lines.append(f"startxref\n{xref_position}\n%%EOF\n")
+        return self.emit("".join(lines).encode("ascii"))
+
+
+def _pattern_resources(first_number, patterns):
+    names = " ".join(f"/P{index} {first_number + index} 0 R" for index in range(len(patterns)))
+    return f"/Pattern << {names} >>"
+
+
+def _iter_pattern_objects(pdf, first_number, patterns):
+    # Colored tiling patterns whose cell extends a full step around the
+    # pattern origin, so copies of a line through the origin may overlap
+    # their neighbours instead of being cut at the step boundary.
+    for index, (step, cell) in enumerate(patterns):
+        step = format_pdf_number(step, PATTERN_PRECISION)
+        cell = cell.encode("ascii")
+        yield (pdf.begin_object(first_number + index) + pdf.emit((
+            f"<< /Type /Pattern /PatternType 1 /PaintType 1 /TilingType 1 /BBox [-{step} -{step} {step} {step}] "
+            f"/XStep {step} /YStep {step} /Resources << >> /Length {len(cell)} >>\nstream\n"
+        ).encode("ascii")) + pdf.emit(cell + b"\nendstream\nendobj\n"))
+
+
+def iter_page_pdf(paper_width_pt, paper_height_pt, content, compress=True, sizes=None, patterns=(), style=None):
+    """
+    Yield a single-page PDF whose page content is produced by content.
+
+    Parameters:
+    - paper_width_pt (float): Page width in points.
+    - paper_height_pt (float): Page height in points.
+    - content (iterable): Chunks (bytes) of the page content stream.
+    - compress (bool): Flate-compress the content stream.
+    - sizes (dict): If given, filled with the content stream's size before
+      ("stream_bytes") and after ("compressed_bytes") compression once the
+      document has been fully yielded.
+    - patterns (list): (step, cell operators) pairs. Each becomes a square
+      tiling pattern named /P0, /P1, ... in the page resources, whose cell
+      may draw up to a step away from the pattern origin.
+    - style (bytes): If given, a content stream run before content, written
+      uncompressed as the last object of the file (see PageTemplate).
+
+    Yields:
+        bytes: Consecutive pieces of the PDF file.
+    """
+    pdf = _PdfEmitter()
+    yield from _iter_page_objects(pdf, paper_width_pt, paper_height_pt, content, compress, sizes, patterns,
+                                  style is not None)
+    if style is not None:
+        yield _style_object(pdf, style)
+    yield pdf.trailer(root=1)
+
+
+class PageTemplate:
+    """
+    A single-page PDF written up to its style stream.
+
+    Every object except the style stream (see iter_page_pdf) precedes it in
+    the file, so their bytes and offsets do not depend on the style. A page
+    with another style is the saved prefix, a new style object and a new
+    cross-reference table, byte for byte what iter_page_pdf writes for the
+    same content and style.
+
+    Parameters:
+    - prefix (bytes): The file up to the style object.
+    - offsets (list): Byte offsets of the objects in prefix.
+    - sizes (dict): The content stream's sizes, as filled by iter_page_pdf.
+    """
+
+    def __init__(self, prefix, offsets, sizes):
+        self.prefix = prefix
+        self.offsets = offsets
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def render(self, style):
+        """Return the complete PDF with the given style stream (bytes)."""
+        pdf = _PdfEmitter()
+        pdf.position = len(self.prefix)
+        pdf.offsets = list(self.offsets)
+        return b"".join((self.prefix, _style_object(pdf, style), pdf.trailer(root=1)))
+
+
+def page_template(paper_width_pt, paper_height_pt, content, compress=True, patterns=()):
+    """
+    Write the style-independent part of a single-page PDF.
+
+    Takes the parameters of iter_page_pdf.
+
+    Returns:
+        PageTemplate: The template, to be rendered with a style stream.
+    """
+    pdf = _PdfEmitter()
+    sizes = {}
+    prefix = b"".join(_iter_page_objects(pdf, paper_width_pt, paper_height_pt, content, compress, sizes,
+                                         patterns, True))
+    return PageTemplate(prefix, pdf.offsets, sizes)
+
+
+def _style_object(pdf, style):
+    # Always the object after the others; see _iter_page_objects.
+    return (pdf.begin_object(len(pdf.offsets) + 1)
+            + pdf.emit(f"<< /Length {len(style)} >>\nstream\n".encode("ascii"))
+            + pdf.emit(style + b"\nendstream\nendobj\n"))
+
+
+def _iter_page_objects(pdf, paper_width_pt, paper_height_pt, content, compress, sizes, patterns, styled):
+    # Objects: 1 catalog, 2 page tree, 3 page, 4-5 content stream and its
+    # length, then the patterns, then the style stream if styled.
+    resources = f"<< {_pattern_resources(6, patterns)} >>" if patterns else "<< >>"
+    contents = f"[{6 + len(patterns)} 0 R 4 0 R]" if styled else "4 0 R"
+    yield pdf.emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield pdf.write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+    yield pdf.write_object(2, "<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+    yield pdf.write_object(3, (
+        f"<< /Type /Page /Parent 2 0 R "
+        f"/MediaBox [0 0 {format_pdf_number(paper_width_pt)} {format_pdf_number(paper_height_pt)}] "
+        f"/Resources {resources} /Contents {contents} >>"
+    ))
+
+    yield from _iter_stream_object(pdf, 4, "", content, compress, sizes)
+    yield from _iter_pattern_objects(pdf, 6, patterns)
+
+
+def _iter_stream_object(pdf, number, entries, content, compress, sizes):
+    # The stream length is not known up front, so it is written after the
+    # stream as the indirect object number + 1.
+    if sizes is None:
+        sizes = {}
+    sizes["stream_bytes"] = 0
+    if compress:
+        yield pdf.begin_object(number) + pdf.emit(
+            f"<< {entries}/Length {number + 1} 0 R /Filter /FlateDecode >>\nstream\n".encode("ascii"))
+        content = _deflate(content, sizes)
+    else:
+        yield pdf.begin_object(number) + pdf.emit(f"<< {entries}/Length {number + 1} 0 R >>\nstream\n".encode("ascii"))
+        content = _counted(content, sizes)
+    length = 0
+    for chunk in content:
+        length += len(chunk)
+        yield pdf.emit(chunk)
+    yield pdf.emit(b"\nendstream\nendobj\n")
+    sizes["compressed_bytes"] = length
+    yield pdf.write_object(number + 1, str(length))
+
+
+def notebook_grid_area(paper_width_pt, paper_height_pt, binding_margin_pt=0, page_numbers=False):
+    """Return the (width, height) of the grid on a notebook page, in points."""
+    return paper_width_pt - binding_margin_pt, paper_height_pt - (FOOTER_HEIGHT if page_numbers else 0)
+
+
+def notebook_grid_origin(page_index, binding_margin_pt=0, page_numbers=False):
+    """
+    Return where the grid of a notebook page starts, in points.
+
+    The binding margin alternates: it is on the left of odd-numbered (right
+    hand) pages and on the right of even-numbered ones, so it always falls on
+    the inner edge when the pages are printed double-sided and bound.
+    """
+    return (binding_margin_pt if page_index % 2 == 0 else 0), (FOOTER_HEIGHT if page_numbers else 0)
+
+
+def _notebook_page_content(page_index, paper_width_pt, paper_height_pt, binding_margin_pt, page_numbers,
+                           grid_color, background_color):
+    operators = []
+    if binding_margin_pt or page_numbers:
+        # The grid form does not cover the margin or the footer band
+        operators.append(f"{_color_operands(background_color)} rg\n"
+                         f"0 0 {format_pdf_number(paper_width_pt)} {format_pdf_number(paper_height_pt)} re f\n")
+    x, y = notebook_grid_origin(page_index, binding_margin_pt, page_numbers)
+    operators.append(f"q 1 0 0 1 {format_pdf_number(x)} {format_pdf_number(y)} cm /Grid Do Q\n")
+    if page_numbers:
+        number = str(page_index + 1)
+        grid_width, _ = notebook_grid_area(paper_width_pt, paper_height_pt, binding_margin_pt, page_numbers)
+        text_x = x + (grid_width - len(number) * HELVETICA_DIGIT_WIDTH * FOOTER_FONT_SIZE) / 2
+        text_y = (FOOTER_HEIGHT - FOOTER_FONT_SIZE * 0.7) / 2
+        operators.append(f"BT /F1 {FOOTER_FONT_SIZE} Tf {_color_operands(grid_color)} rg "
+                         f"{format_pdf_number(text_x)} {format_pdf_number(text_y)} Td ({number}) Tj ET\n")
+    return "".join(operators).encode("ascii")
+
+
+def iter_notebook_pdf(paper_width_pt, paper_height_pt, content, pages, binding_margin_pt=0, page_numbers=False,
+                      grid_color="#B7C9EE", background_color="#FFFFFF", compress=True, sizes=None, patterns=()):
+    """
+    Yield a multi-page PDF that draws the same grid on every page.
+
+    The grid is written once as a Form XObject; each page's own content
+    stream only places it (and paints the margin and page number), so file
+    size and render time barely grow with the page count.
+
+    Parameters:
+    - paper_width_pt (float): Page width in points.
+    - paper_height_pt (float): Page height in points.
+    - content (iterable): Chunks (bytes) of the grid's content stream, drawn
+      in a notebook_grid_area() sized box at the origin.
+    - pages (int): Number of pages.
+    - binding_margin_pt (float): Width of the alternating inner margin.
+    - page_numbers (bool): Number the pages in a footer band.
+    - grid_color, background_color (str): #RRGGBB colors of the page numbers
+      and of the margin and footer background.
+    - compress (bool): Flate-compress the grid's content stream.
+    - sizes (dict): Filled with the grid stream's sizes, as in iter_page_pdf.
+    - patterns (list): Tiling patterns used by the grid, as in iter_page_pdf.
+
+    Yields:
+        bytes: Consecutive pieces of the PDF file.
+    """
+    # Objects: 1 catalog, 2 page tree, 3 shared resources, 4 font, 5-6 grid
+    # form and its length, then a page object and a content stream per page,
+    # then the grid's patterns.
+    first_page = 7
+    first_pattern = first_page + 2 * pages
+    kids = " ".join(f"{first_page + 2 * i} 0 R" for i in range(pages))
+    grid_width, grid_height = notebook_grid_area(paper_width_pt, paper_height_pt, binding_margin_pt, page_numbers)
+    media_box = f"[0 0 {format_pdf_number(paper_width_pt)} {format_pdf_number(paper_height_pt)}]"
+
+    pdf = _PdfEmitter()
+    yield pdf.emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield pdf.write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+    yield pdf.write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} /MediaBox {media_box} >>")
+    yield pdf.write_object(3, "<< /XObject << /Grid 5 0 R >> /Font << /F1 4 0 R >> >>")
+    yield pdf.write_object(4, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    form = f"/Type /XObject /Subtype /Form /BBox [0 0 {format_pdf_number(grid_width)} {format_pdf_number(grid_height)}] "
+    if patterns:
+        form += f"/Resources << {_pattern_resources(first_pattern, patterns)} >> "
+    yield from _iter_stream_object(pdf, 5, form, content, compress, sizes)
+
+    for index in range(pages):
+        number = first_page + 2 * index
+        yield pdf.write_object(number, f"<< /Type /Page /Parent 2 0 R /Resources 3 0 R /Contents {number + 1} 0 R >>")
+        page_content = _notebook_page_content(index, paper_width_pt, paper_height_pt, binding_margin_pt,
+                                              page_numbers, grid_color, background_color)
+        yield (pdf.begin_object(number + 1)
+               + pdf.emit(f"<< /Length {len(page_content)} >>\nstream\n".encode("ascii"))
+               + pdf.emit(page_content + b"\nendstream\nendobj\n"))
+    yield from _iter_pattern_objects(pdf, first_pattern, patterns)
+    yield pdf.trailer(root=1)
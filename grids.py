@@ -0,0 +1,609 @@
+"""
+Grid specs: validation, canonical form and rendering to PDF.
+
+Used by the web app and by generate.py. Importing this module has no side
+effects beyond reading its settings from the environment: nothing is
+written to disk and no metrics are recorded.
+"""
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import tempfile
+
+import gridpdf
+import grid_types
+import cost_model
+import paper_sizes
+from gridpdf import format_pdf_number, grid_line_positions
+from render_cache import RenderCache
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the rendered bytes for a given spec change.
+RENDER_VERSION = '2'
+
+# Render budgets, checked against cost_model estimates before rendering.
+# Specs over these limits are rejected.
+MAX_RENDER_SECONDS = float(os.environ.get('GRID_MAX_RENDER_SECONDS', 5.0))
+MAX_OUTPUT_BYTES = int(os.environ.get('GRID_MAX_OUTPUT_BYTES', 32 * 1024 * 1024))
+
+# Sheets estimated to exceed this size are rendered straight into the disk
+# tier of the render cache and sent from the file (or streamed as they are
+# written if there is no disk tier) instead of being held in memory.
+STREAM_MIN_BYTES = int(os.environ.get('GRID_STREAM_MIN_BYTES', 1024 * 1024))
+
+# Rendered documents are held in memory up to this size and spill over to a
+# temporary file beyond it.
+SPOOL_MAX_BYTES = int(os.environ.get('GRID_SPOOL_MAX_BYTES', 1024 * 1024))
+
+# Largest notebook accepted
+MAX_PAGES = int(os.environ.get('GRID_MAX_PAGES', 500))
+
+# Decimals kept in coordinates of compact output. 1 decimal is 1/720 inch,
+# well below what printers resolve for grid lines.
+COMPACT_PRECISION = int(os.environ.get('GRID_COMPACT_PRECISION', 1))
+
+# Defaults for /grid.pdf query parameters that are left out
+GRID_QUERY_DEFAULTS = {
+    'grid_size_mm': '5',
+    'grid_color': '#B7C9EE',
+    'background_color': '#FFFFFF',
+    'line_thickness': '0.3',
+}
+
+# Style-independent parts of single-page PDFs (gridpdf.PageTemplate) by
+# geometry, so a new grid color, background or line thickness for a known
+# paper size and grid is written without rendering. Templates are only kept
+# in memory; RenderCache bounds them by their length in bytes.
+PAGE_TEMPLATES = RenderCache(max_bytes=int(os.environ.get('GRID_TEMPLATE_CACHE_MAX_BYTES', 32 * 1024 * 1024)))
+def get_available_paper_sizes():
+    """
+    Return the predefined paper sizes.
+
+    The sizes come from the precomputed table in paper_sizes, which mirrors
+    reportlab.lib.pagesizes without importing it at startup.
+
+    Returns:
+        dict: A dictionary mapping paper size names to their (width, height) in points.
+    """
+    return dict(paper_sizes.PAPER_SIZES)
+
+AVAILABLE_PAPER_SIZES = get_available_paper_sizes()
+
+# Options of the paper size menu
+PREDEFINED_SIZE_NAMES = sorted(AVAILABLE_PAPER_SIZES)
+
+def validate_hex_color(hex_color):
+    """Validate if the provided string is a valid hex color code."""
+    if not isinstance(hex_color, str):
+        return False
+    if not hex_color.startswith("#"):
+            return False
+    if len(hex_color) not in [4, 7]:
+        return False
+    hex_digits = "0123456789ABCDEFabcdef"
+    for char in hex_color[1:]:
+        if char not in hex_digits:
+            return False
+    return True
+
+def normalize_hex_color(hex_color):
+    """Expand a valid hex color to the uppercase #RRGGBB form."""
+    digits = hex_color.lstrip("#").upper()
+    if len(digits) == 3:
+        digits = "".join(char * 2 for char in digits)
+    return "#" + digits
+
+def canonical_spec(paper_width_mm, paper_height_mm, grid_size_mm, grid_color, background_color, line_thickness,
+                   grid_type='square', compact=False, pages=1, binding_margin_mm=0, page_numbers=False):
+    """
+    Canonicalize validated grid parameters.
+
+    Paper dimensions and the binding margin are rounded to 0.01 mm, grid size
+    and line thickness to 0.001, and colors are normalized to uppercase
+    #RRGGBB. Equivalent requests therefore map to the same spec, which is also
+    what gets rendered.
+
+    Returns:
+        dict: Keyword arguments for create_grid_pdf.
+    """
+    return {
+        'paper_width_mm': round(float(paper_width_mm), 2),
+        'paper_height_mm': round(float(paper_height_mm), 2),
+        'grid_size_mm': round(float(grid_size_mm), 3),
+        'grid_color': normalize_hex_color(grid_color),
+        'background_color': normalize_hex_color(background_color),
+        'line_thickness': round(float(line_thickness), 3),
+        'grid_type': grid_type,
+        'compact': bool(compact),
+        'pages': int(pages),
+        'binding_margin_mm': round(float(binding_margin_mm), 2),
+        'page_numbers': bool(page_numbers),
+    }
+
+def spec_key(spec):
+    """
+    Return a stable string key for a canonical spec.
+
+    The key includes RENDER_VERSION, and COMPACT_PRECISION for compact specs,
+    so cached documents and ETags are not reused after the output changes.
+    """
+    version = RENDER_VERSION + (f'c{COMPACT_PRECISION}' if spec.get('compact') else '')
+    return version + ':' + json.dumps(spec, sort_keys=True, separators=(',', ':'))
+
+def spec_etag(spec):
+    """Return the strong ETag value (unquoted) for the PDF rendered from a spec."""
+    return hashlib.sha256(spec_key(spec).encode('utf-8')).hexdigest()[:32]
+
+def geometry_precision(grid_type, compact):
+    """Return the decimals written for the coordinates of a grid type."""
+    if compact:
+        return COMPACT_PRECISION
+    return gridpdf.PRECISION if grid_type == "square" else grid_types.PRECISION
+
+def iter_grid_type_content(grid_width_pt, grid_height_pt, grid_size_pt, grid_color, background_color,
+                           line_thickness, grid_type="square", compact=False):
+    """Yield the content stream drawing a grid of any type in a box at the origin."""
+    precision = geometry_precision(grid_type, compact)
+    if grid_type == "square":
+        return gridpdf.iter_grid_content(grid_width_pt, grid_height_pt, grid_size_pt, grid_color, background_color,
+                                         line_thickness, precision, compact)
+    return grid_types.iter_content(grid_type, grid_width_pt, grid_height_pt, grid_size_pt, grid_color,
+                                   background_color, line_thickness, precision, compact)
+
+def iter_grid_type_geometry(grid_width_pt, grid_height_pt, grid_size_pt, grid_type="square", compact=False):
+    """Yield the content stream of a grid's geometry alone, to be run after grid_type_style()."""
+    precision = geometry_precision(grid_type, compact)
+    if grid_type == "square":
+        return gridpdf.iter_grid_lines(grid_width_pt, grid_height_pt, grid_size_pt, precision)
+    return grid_types.iter_geometry(grid_type, grid_width_pt, grid_height_pt, grid_size_pt, 0, precision, compact,
+                                    set_width=False)
+
+def grid_type_style(grid_width_pt, grid_height_pt, grid_color, background_color, line_thickness,
+                    grid_type="square", compact=False):
+    """Return the style stream (bytes) of a grid: background, grid color and line width."""
+    if grid_type == "square":
+        line_width = line_thickness
+    else:
+        line_width = grid_types.line_width(grid_type, line_thickness, geometry_precision(grid_type, compact))
+    return gridpdf.style_operators(grid_width_pt, grid_height_pt, grid_color, background_color, line_width,
+                                   compact).encode("ascii")
+
+def page_template_key(paper_width_mm, paper_height_mm, grid_size_mm, grid_type, compact):
+    """Return the PAGE_TEMPLATES key of a single-page geometry."""
+    version = RENDER_VERSION + (f'c{COMPACT_PRECISION}' if compact else '')
+    return json.dumps([version, paper_width_mm, paper_height_mm, grid_size_mm, grid_type, bool(compact)])
+
+def iter_grid_type_pdf(paper_width_mm, paper_height_mm, grid_size_mm, grid_color, background_color,
+                       line_thickness, grid_type="square", compact=False, pages=1, binding_margin_mm=0,
+                       page_numbers=False, sizes=None, pattern=False, templates=True):
+    """
+    Yield a grid PDF of any grid type in chunks with the native writer.
+
+    Colors must be #RRGGBB. Square grids use gridpdf's streaming line writer;
+    other types are drawn from grid_types' vectorized geometry. With pattern,
+    grid types in grid_types.PATTERN_TYPES are drawn as tiling pattern fills
+    instead, whose size does not depend on the grid size. Compact output
+    rounds coordinates to COMPACT_PRECISION decimals and drops redundant
+    operators. Notebooks (several pages, a binding margin or page numbers)
+    draw the grid once as a form shared by all pages. If sizes is given, it is
+    filled with the grid's content stream size before and after compression
+    (see gridpdf.iter_page_pdf).
+
+    Single pages keep their colors and line width in a separate style stream.
+    Unless the sheet is larger than STREAM_MIN_BYTES, and so is streamed, the
+    rest of the file is taken from PAGE_TEMPLATES, or written once and added
+    to it; the style stream and cross-reference table are then all that is
+    written. Both ways produce the same bytes. With templates=False the page
+    is written in full and PAGE_TEMPLATES is neither read nor filled, so
+    repeated renders (e.g. in benchmarks) cost what a first render costs.
+    """
+    return _iter_grid_type_pdf(paper_width_mm, paper_height_mm, grid_size_mm, grid_color, background_color,
+                               line_thickness, grid_type, compact, pages, binding_margin_mm, page_numbers, sizes,
+                               pattern, templates)[0]
+
+def _iter_grid_type_pdf(paper_width_mm, paper_height_mm, grid_size_mm, grid_color, background_color,
+                        line_thickness, grid_type, compact, pages, binding_margin_mm, page_numbers, sizes,
+                        pattern, templates):
+    # Returns (chunks, reused) where reused tells whether the page was
+    # written from a template already in PAGE_TEMPLATES
+    paper_width_pt = paper_width_mm * gridpdf.MM
+    paper_height_pt = paper_height_mm * gridpdf.MM
+    grid_size_pt = grid_size_mm * gridpdf.MM
+    binding_margin_pt = binding_margin_mm * gridpdf.MM
+    notebook = pages > 1 or binding_margin_pt > 0 or page_numbers
+    grid_width_pt, grid_height_pt = gridpdf.notebook_grid_area(paper_width_pt, paper_height_pt,
+                                                               binding_margin_pt, page_numbers)
+    patterns = ()
+    if pattern and grid_type in grid_types.PATTERN_TYPES:
+        content, patterns = grid_types.pattern_content(grid_type, grid_width_pt, grid_height_pt, grid_size_pt,
+                                                       grid_color, background_color, line_thickness, compact)
+        content = [content]
+    elif not notebook:
+        style = grid_type_style(paper_width_pt, paper_height_pt, grid_color, background_color, line_thickness,
+                                grid_type, compact)
+        key = page_template_key(paper_width_mm, paper_height_mm, grid_size_mm, grid_type, compact)
+        template = PAGE_TEMPLATES.get(key) if templates else None
+        reused = template is not None
+        if template is None:
+            geometry = iter_grid_type_geometry(paper_width_pt, paper_height_pt, grid_size_pt, grid_type, compact)
+            estimate = cost_model.estimate({'paper_width_mm': paper_width_mm, 'paper_height_mm': paper_height_mm,
+                                            'grid_size_mm': grid_size_mm, 'grid_type': grid_type})
+            if not templates or estimate['file_bytes'] > STREAM_MIN_BYTES:
+                return gridpdf.iter_page_pdf(paper_width_pt, paper_height_pt, geometry, sizes=sizes,
+                                             style=style), False
+            template = gridpdf.page_template(paper_width_pt, paper_height_pt, geometry)
+            PAGE_TEMPLATES.put(key, template)
+        if sizes is not None:
+            sizes.update(template.sizes)
+        return iter([template.render(style)]), reused
+    else:
+        content = iter_grid_type_content(grid_width_pt, grid_height_pt, grid_size_pt, grid_color, background_color,
+                                         line_thickness, grid_type, compact)
+    if not notebook:
+        return gridpdf.iter_page_pdf(paper_width_pt, paper_height_pt, content, sizes=sizes, patterns=patterns), False
+    return gridpdf.iter_notebook_pdf(paper_width_pt, paper_height_pt, content, pages, binding_margin_pt,
+                                     page_numbers, grid_color, background_color, sizes=sizes,
+                                     patterns=patterns), False
+
+def create_grid_pdf(paper_width_mm, paper_height_mm, grid_size_mm=5, grid_color="#B7C9EE",
+                    background_color="#FFFFFF", line_thickness=0.3, render_mode="path", engine="native",
+                    deterministic=True, timings=None, grid_type="square", compact=False, pages=1,
+                    binding_margin_mm=0, page_numbers=False, sizes=None, templates=True):
+    """
+    Create a vector-based grid PDF with specified paper size and background color.
+
+    The "native" engine writes the document directly with gridpdf; ReportLab is
+    used for the "reportlab" engine, for render_mode="lines", and as a fallback
+    if the native writer fails (drawing render_mode="pattern" as a path). The
+    native writer embeds no dates or document IDs, so its output is always
+    deterministic. Single pages reuse a cached PageTemplate of the same
+    geometry, so other colors or line thicknesses are not rendered again
+    (unless templates is False).
+    
+    Parameters:
+    - paper_width_mm (float): Width of the paper in millimeters.
+    - paper_height_mm (float): Height of the paper in millimeters.
+    - grid_size_mm (float): Size of each grid square in millimeters.
+    - grid_color (str): Hex color code for the grid lines.
+    - background_color (str): Hex color code for the background.
+    - line_thickness (float): Thickness of the grid lines in points.
+    - render_mode (str): "path" strokes all grid lines as a single path object;
+      "lines" issues one canvas.line call per grid line; "pattern" fills the
+      page with a tiling pattern of one grid cell, so output size and render
+      time do not grow with grid density (square, dot and ruled grids with
+      the native engine; other grids are drawn as a path).
+    - engine (str): "native" or "reportlab".
+    - deterministic (bool): Produce byte-identical output for identical
+      parameters (ReportLab's invariant mode: fixed dates and document ID).
+    - timings (dict): If given, filled with the seconds spent in each stage
+      ("write" for the native engine, or "template" if the page was written
+      from a cached PageTemplate; "canvas", "draw" and "save" for ReportLab).
+    - grid_type (str): One of grid_types.GRID_TYPES. Types other than "square"
+      are drawn from grid_types' vectorized geometry with either engine.
+    - compact (bool): Round coordinates to COMPACT_PRECISION decimals, drop
+      redundant operators and, with ReportLab, Flate-compress the page
+      (the native writer always compresses).
+    - pages (int): Number of pages. Every page shows the same grid, which
+      both engines draw once as a form referenced from each page.
+    - binding_margin_mm (float): Blank margin on the inner edge of each page,
+      alternating between left and right for double-sided printing.
+    - page_numbers (bool): Print page numbers in a footer band.
+    - sizes (dict): If given, the native engine fills it with the grid's
+      content stream size before ("stream_bytes") and after
+      ("compressed_bytes") compression.
+    - templates (bool): Use and fill PAGE_TEMPLATES (see iter_grid_type_pdf).
+      Benchmarks turn it off to time full renders.
+    
+    Returns:
+        SpooledTemporaryFile: The PDF, positioned at its start. It is held in
+        memory up to SPOOL_MAX_BYTES and in a temporary file beyond that.
+    """
+    if timings is None:
+        timings = {}
+    start = time.perf_counter()
+    if engine == "native" and render_mode in ("path", "pattern"):
+        buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        try:
+            chunks, reused = _iter_grid_type_pdf(paper_width_mm, paper_height_mm, grid_size_mm,
+                                                 normalize_hex_color(grid_color),
+                                                 normalize_hex_color(background_color), line_thickness, grid_type,
+                                                 compact, pages, binding_margin_mm, page_numbers, sizes,
+                                                 render_mode == "pattern", templates)
+            for chunk in chunks:
+                buffer.write(chunk)
+            buffer.seek(0)
+            timings["template" if reused else "write"] = time.perf_counter() - start
+            return buffer
+        except Exception as e:
+            buffer.close()
+            logger.warning("Native PDF writer failed, falling back to ReportLab: %s", e)
+            if sizes is not None:
+                sizes.clear()
+    elif engine not in ("native", "reportlab"):
+        raise RuntimeError(f"Failed to create PDF: unknown engine {engine}")
+
+    # ReportLab is imported on first use so the app starts without it
+    from reportlab.pdfgen import canvas
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    start = time.perf_counter()
+    try:
+        # Convert paper size from mm to points
+        paper_width_pt = paper_width_mm * gridpdf.MM
+        paper_height_pt = paper_height_mm * gridpdf.MM
+
+        # Create a canvas with custom paper size
+        c = canvas.Canvas(buffer, pagesize=(paper_width_pt, paper_height_pt), invariant=int(deterministic),
+                          pageCompression=int(compact))
+
+        # A notebook draws the grid once into a form and places it on each page
+        binding_margin_pt = binding_margin_mm * gridpdf.MM
+        notebook = pages > 1 or binding_margin_pt > 0 or page_numbers
+        grid_width_pt, grid_height_pt = gridpdf.notebook_grid_area(paper_width_pt, paper_height_pt,
+                                                                   binding_margin_pt, page_numbers)
+        if notebook:
+            c.beginForm("grid", 0, 0, grid_width_pt, grid_height_pt)
+
+        # Set background color
+        background_color_rgb = tuple(int(background_color.lstrip("#")[i:i+2], 16)/255 for i in (0, 2, 4))
+        c.setFillColorRGB(*background_color_rgb)
+        c.rect(0, 0, grid_width_pt, grid_height_pt, fill=1, stroke=0)
+
+        # Convert grid size to points
+        grid_size_pt = grid_size_mm * gridpdf.MM
+
+        # Convert hex color to RGB (0-1 range)
+        grid_color_rgb = tuple(int(grid_color.lstrip("#")[i:i+2], 16)/255 for i in (0, 2, 4))
+
+        # Set grid line color and line width
+        c.setStrokeColorRGB(*grid_color_rgb)
+        c.setLineWidth(line_thickness)  # Set line width based on user input
+
+        timings["canvas"] = time.perf_counter() - start
+        start = time.perf_counter()
+
+        xs = grid_line_positions(grid_width_pt, grid_size_pt)
+        ys = grid_line_positions(grid_height_pt, grid_size_pt)
+
+        if grid_type != "square":
+            precision = COMPACT_PRECISION if compact else grid_types.PRECISION
+            geometry = grid_types.iter_geometry(grid_type, grid_width_pt, grid_height_pt, grid_size_pt,
+                                                line_thickness, precision, compact)
+            c.addLiteral(b"".join(geometry).decode("ascii"))
+        elif render_mode in ("path", "pattern"):
+            # Emit every line into one path with a single stroke operator.
+            # Each coordinate is formatted once instead of once per endpoint.
+            precision = COMPACT_PRECISION if compact else gridpdf.PRECISION
+            width = format_pdf_number(grid_width_pt, precision)
+            height = format_pdf_number(grid_height_pt, precision)
+            operators = []
+            for x in (format_pdf_number(x, precision) for x in xs):
+                operators.append(f"{x} 0 m {x} {height} l")
+            for y in (format_pdf_number(y, precision) for y in ys):
+                operators.append(f"0 {y} m {width} {y} l")
+            operators.append("S")
+            c.addLiteral("\n".join(operators))
+        elif render_mode == "lines":
+            # Draw vertical lines
+            for x in xs:
+                c.line(x, 0, x, grid_height_pt)
+
+            # Draw horizontal lines
+            for y in ys:
+                c.line(0, y, grid_width_pt, y)
+        else:
+            raise ValueError(f"Unknown render mode: {render_mode}")
+
+        if notebook:
+            c.endForm()
+            for index in range(pages):
+                c.setFillColorRGB(*background_color_rgb)
+                c.rect(0, 0, paper_width_pt, paper_height_pt, fill=1, stroke=0)
+                x, y = gridpdf.notebook_grid_origin(index, binding_margin_pt, page_numbers)
+                c.saveState()
+                c.translate(x, y)
+                c.doForm("grid")
+                c.restoreState()
+                if page_numbers:
+                    c.setFillColorRGB(*grid_color_rgb)
+                    c.setFont("Helvetica", gridpdf.FOOTER_FONT_SIZE)
+                    c.drawCentredString(x + grid_width_pt / 2,
+                                        (gridpdf.FOOTER_HEIGHT - gridpdf.FOOTER_FONT_SIZE * 0.7) / 2, str(index + 1))
+                c.showPage()
+
+        timings["draw"] = time.perf_counter() - start
+        start = time.perf_counter()
+
+        # Finalize the PDF
+        c.save()
+        buffer.seek(0)
+        timings["save"] = time.perf_counter() - start
+        return buffer
+    except Exception as e:
+        buffer.close()
+        raise RuntimeError(f"Failed to create PDF: {e}")
+
+def parse_grid_params(data, check_budget=True):
+    """
+    Validate grid parameters submitted through the form or the API.
+
+    Records no metrics; the app's download paths use parse_download_params
+    instead.
+
+    Parameters:
+    - data (Mapping): Submitted fields (paper_size_option, predefined_size,
+      custom_width_cm, custom_height_cm, grid_size_mm, grid_color,
+      background_color, line_thickness, grid_type, compact, pages,
+      binding_margin_mm, page_numbers, output_filename).
+    - check_budget (bool): Also reject specs over the render budgets.
+
+    Returns:
+        tuple: (spec, output_filename, errors) where spec is the canonical spec
+        for create_grid_pdf, or None if errors is non-empty.
+    """
+    errors = []
+
+    # JSON bodies (e.g. /batch) may carry any type; these fields are used as
+    # text and dictionary keys
+    for name in ('paper_size_option', 'predefined_size', 'grid_type', 'output_filename'):
+        if data.get(name) is not None and not isinstance(data.get(name), str):
+            errors.append(f"{name} must be a string.")
+    if errors:
+        return None, "grid_template.pdf", errors
+
+    # Retrieve submitted data
+    paper_size_option = data.get('paper_size_option')
+    predefined_size = data.get('predefined_size')
+    custom_width_cm = data.get('custom_width_cm')
+    custom_height_cm = data.get('custom_height_cm')
+    grid_size_mm = data.get('grid_size_mm')
+    grid_color = data.get('grid_color')
+    background_color = data.get('background_color')
+    line_thickness = data.get('line_thickness')
+    output_filename = data.get('output_filename') or ''
+    grid_type = data.get('grid_type') or 'square'
+    compact = str(data.get('compact', '')).lower() in ('1', 'on', 'true', 'yes')
+    pages = data.get('pages')
+    if pages is None or pages == '':
+        pages = 1
+    binding_margin_mm = data.get('binding_margin_mm') or 0
+    page_numbers = str(data.get('page_numbers', '')).lower() in ('1', 'on', 'true', 'yes')
+
+    # Validation
+    # Paper size
+    if paper_size_option == 'predefined':
+        if predefined_size not in AVAILABLE_PAPER_SIZES:
+            errors.append("Selected predefined paper size is not supported.")
+        else:
+            paper_width_pt, paper_height_pt = AVAILABLE_PAPER_SIZES[predefined_size]
+            paper_width_mm = paper_width_pt / gridpdf.MM
+            paper_height_mm = paper_height_pt / gridpdf.MM
+    elif paper_size_option == 'custom':
+        try:
+            custom_width_cm = float(custom_width_cm)
+            custom_height_cm = float(custom_height_cm)
+            if not math.isfinite(custom_width_cm) or not math.isfinite(custom_height_cm):
+                errors.append("Custom paper dimensions must be valid numbers.")
+            elif custom_width_cm <= 0 or custom_height_cm <= 0:
+                errors.append("Custom paper dimensions must be positive numbers.")
+            paper_width_mm = custom_width_cm * 10
+            paper_height_mm = custom_height_cm * 10
+        except (TypeError, ValueError):
+            errors.append("Custom paper dimensions must be valid numbers.")
+    else:
+        errors.append("Invalid paper size option selected.")
+
+    # Grid size
+    try:
+        grid_size_mm = float(grid_size_mm)
+        if not math.isfinite(grid_size_mm):
+            errors.append("Grid size must be a valid number.")
+        elif grid_size_mm <= 0:
+            errors.append("Grid size must be a positive number.")
+    except (TypeError, ValueError):
+        errors.append("Grid size must be a valid number.")
+
+    # Grid type
+    if grid_type not in grid_types.GRID_TYPES:
+        errors.append("Selected grid type is not supported.")
+
+    # Notebook pages
+    try:
+        # int() would truncate 2.5 to 2
+        if isinstance(pages, float) and not pages.is_integer():
+            raise ValueError(pages)
+        pages = int(pages)
+        if not 1 <= pages <= MAX_PAGES:
+            errors.append(f"Number of pages must be between 1 and {MAX_PAGES}.")
+    except (TypeError, ValueError):
+        errors.append("Number of pages must be a whole number.")
+
+    # Binding margin and footer must leave room for the grid
+    try:
+        binding_margin_mm = float(binding_margin_mm)
+        if not math.isfinite(binding_margin_mm):
+            errors.append("Binding margin must be a valid number.")
+        elif binding_margin_mm < 0:
+            errors.append("Binding margin must not be negative.")
+        elif not errors and binding_margin_mm >= paper_width_mm:
+            errors.append("Binding margin must be narrower than the paper.")
+    except (TypeError, ValueError):
+        errors.append("Binding margin must be a valid number.")
+    if page_numbers and not errors and paper_height_mm * gridpdf.MM <= gridpdf.FOOTER_HEIGHT:
+        errors.append("The paper is too short for page numbers.")
+
+    # Grid color
+    if not validate_hex_color(grid_color):
+        errors.append("Invalid hex color code for Grid Color.")
+
+    # Background color
+    if not validate_hex_color(background_color):
+        errors.append("Invalid hex color code for Background Color.")
+
+    # Line thickness
+    try:
+        line_thickness = float(line_thickness)
+        if not math.isfinite(line_thickness):
+            errors.append("Line thickness must be a valid number.")
+        elif line_thickness <= 0:
+            errors.append("Line thickness must be a positive number.")
+    except (TypeError, ValueError):
+        errors.append("Line thickness must be a valid number.")
+
+    # Output filename
+    if not output_filename.strip():
+        output_filename = "grid_template.pdf"
+    elif not output_filename.lower().endswith('.pdf'):
+        output_filename += '.pdf'
+
+    if errors:
+        return None, output_filename, errors
+
+    spec = canonical_spec(
+        paper_width_mm=paper_width_mm,
+        paper_height_mm=paper_height_mm,
+        grid_size_mm=grid_size_mm,
+        grid_color=grid_color,
+        background_color=background_color,
+        line_thickness=line_thickness,
+        grid_type=grid_type,
+        compact=compact,
+        pages=pages,
+        binding_margin_mm=binding_margin_mm,
+        page_numbers=page_numbers
+    )
+
+    # Values that round to zero in the canonical spec
+    if spec['paper_width_mm'] <= 0 or spec['paper_height_mm'] <= 0:
+        errors.append("Paper dimensions must be at least 0.01 mm.")
+    if spec['grid_size_mm'] <= 0:
+        errors.append("Grid size must be at least 0.001 mm.")
+    if spec['line_thickness'] <= 0:
+        errors.append("Line thickness must be at least 0.001 pt.")
+    if spec['binding_margin_mm'] >= spec['paper_width_mm']:
+        errors.append("Binding margin must be narrower than the paper.")
+    if errors:
+        return None, output_filename, errors
+
+    if check_budget:
+        budget_error = render_budget_error(spec)
+        if budget_error:
+            return None, output_filename, [budget_error]
+    return spec, output_filename, errors
+
+def render_budget_error(spec):
+    """Return an error message if a canonical spec is estimated to exceed the render budgets, otherwise None."""
+    return cost_model.over_budget(cost_model.estimate(spec), MAX_RENDER_SECONDS, MAX_OUTPUT_BYTES)
+
+def query_grid_args(query):
+    """Return query parameters as form fields, filling in defaults and paper_size_option."""
+    args = query.to_dict()
+    for name, value in GRID_QUERY_DEFAULTS.items():
+        args.setdefault(name, value)
+    if 'paper_size_option' not in args:
+        args['paper_size_option'] = 'custom' if 'custom_width_cm' in args else 'predefined'
+    return args
@@ -0,0 +1,47 @@
+"""
+Gunicorn settings tuned for fast cold starts.
+
+The app is imported once in the master (preload_app) and the default grids of
+the most common paper sizes, plus the most requested specs in the render log,
+are rendered into the cache before the workers are forked, along with the
+index page, so every worker starts with Flask, the renderer, the page and
+the warm cache already in memory. Each
+worker then runs the periodic pre-warm job (one worker at a time).
+
+The worker timeout stays above the render pools' timeouts (see app.py), so
+a slow render ends in a RenderTimeout and a 503 instead of the worker being
+killed mid-request.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5010)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = True
+
+# Seconds a sync worker may spend on one request before it is killed. The
+# default leaves GRID_TIMEOUT_MARGIN seconds beyond the longest render pool
+# timeout for sending the response.
+timeout = int(os.environ.get('GRID_WORKER_TIMEOUT', max(
+    float(os.environ.get('GRID_RENDER_TIMEOUT', 30)),
+    float(os.environ.get('GRID_SLOW_RENDER_TIMEOUT', 120)),
+) + float(os.environ.get('GRID_TIMEOUT_MARGIN', 30))))
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before forking
+    import time
+    from app import index_shell, warm_render_cache
+
+    start = time.perf_counter()
+    index_shell()
+    rendered = warm_render_cache()
+    server.log.info("Warmed render cache with %d specs in %.1f ms", rendered, (time.perf_counter() - start) * 1000)
+
+
+def post_worker_init(worker):
+    from app import start_prewarm_thread
+
+    start_prewarm_thread()
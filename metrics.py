@@ -0,0 +1,206 @@
+"""
+Prometheus-style metrics shared across gunicorn workers.
+
+Each process keeps its counters and histograms in memory, and a background
+thread writes them to the process's own snapshot file in a shared directory
+within write_interval seconds of any change. A scrape sums the snapshots of
+every process, including ones that have since exited, so counters stay
+monotonic when gunicorn recycles workers.
+"""
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LINES_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000, 100000)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    """
+    Registry of counters and histograms for one process.
+
+    Parameters:
+    - directory (str): Shared directory for per-process snapshots.
+    - write_interval (float): Seconds between snapshot writes while values
+      change; other processes see an update at most this late.
+    """
+
+    def __init__(self, directory, write_interval=1.0):
+        self.directory = directory
+        self.write_interval = write_interval
+        self._help = {}
+        self._types = {}
+        self._buckets = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._writer = None
+        self._pid = os.getpid()
+        self._run_id = uuid.uuid4().hex
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.write_snapshot)
+
+    def counter(self, name, help_text):
+        """Declare a counter."""
+        self._help[name] = help_text
+        self._types[name] = 'counter'
+
+    def histogram(self, name, help_text, buckets):
+        """Declare a histogram with the given bucket upper bounds."""
+        self._help[name] = help_text
+        self._types[name] = 'histogram'
+        self._buckets[name] = tuple(buckets)
+
+    def _check_process(self):
+        # Caller holds self._lock. A forked child starts from empty values
+        # and without the parent's writer thread; the parent's values stay in
+        # the parent's snapshot.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._run_id = uuid.uuid4().hex
+            self._counters = {}
+            self._histograms = {}
+            self._dirty = False
+            self._writer = None
+
+    def _changed(self):
+        # Caller holds self._lock.
+        self._dirty = True
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='metrics-snapshot', daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.write_interval)
+            if self._dirty:
+                self.write_snapshot()
+
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter."""
+        with self._lock:
+            self._check_process()
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._changed()
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram."""
+        buckets = self._buckets[name]
+        with self._lock:
+            self._check_process()
+            key = (name, _label_key(labels))
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * len(buckets), 0, 0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+            self._changed()
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe the duration of the with-block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _snapshot_path(self, pid, run_id):
+        # A reused PID must not overwrite the snapshot of the exited process
+        return os.path.join(self.directory, f"metrics-{pid}-{run_id}.json")
+
+    def write_snapshot(self):
+        """Atomically write this process's values to its snapshot file."""
+        with self._lock:
+            self._check_process()
+            self._dirty = False
+            if not self._counters and not self._histograms:
+                return
+            data = {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, entry] for (name, labels), entry in self._histograms.items()],
+            }
+            path = self._snapshot_path(self._pid, self._run_id)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _collect(self):
+        counters = {}
+        histograms = {}
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric, labels, value in data['counters']:
+                key = (metric, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for metric, labels, (bucket_counts, count, total) in data['histograms']:
+                key = (metric, tuple(map(tuple, labels)))
+                entry = histograms.get(key)
+                if entry is None or len(entry[0]) != len(bucket_counts):
+                    entry = histograms[key] = [[0] * len(bucket_counts), 0, 0.0]
+                entry[0] = [a + b for a, b in zip(entry[0], bucket_counts)]
+                entry[1] += count
+                entry[2] += total
+        return counters, histograms
+
+    def render(self):
+        """Return the aggregated metrics of all processes in the text exposition format."""
+        self.write_snapshot()
+        counters, histograms = self._collect()
+        lines = []
+        for name in sorted(self._types):
+            lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {self._types[name]}")
+            if self._types[name] == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for (metric, labels), (bucket_counts, count, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self._buckets[name], bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
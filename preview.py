@@ -0,0 +1,111 @@
+"""
+Screen-sized previews of grid pages.
+
+Previews use the same grid_types geometry as the PDF renderer, scaled to fit
+a box of PREVIEW_MAX_WIDTH_PX by PREVIEW_HEIGHT_PX. Grids denser than the screen can show are decimated:
+the pitch is multiplied by the smallest integer that keeps at least
+MIN_PITCH_PX between lines, so the preview stays small and fast to draw.
+"""
+import math
+from io import BytesIO
+
+import numpy as np
+
+import grid_types
+from gridpdf import MM
+
+# Box the previewed page is scaled to fit, in pixels, so long, thin sheets
+# cannot make a huge image
+PREVIEW_HEIGHT_PX = 480
+PREVIEW_MAX_WIDTH_PX = 960
+
+# Smallest spacing between previewed lines or dots, in pixels. Coordinates
+# are written in whole points, which is below a pixel at preview scale.
+MIN_PITCH_PX = 6
+
+
+def preview_geometry(spec):
+    """
+    Compute the decimated preview geometry for a canonical spec.
+
+    Returns:
+        tuple: (kind, primitives, width_pt, height_pt, scale, size) where
+        primitives are in points, scale is pixels per point and size is the
+        preview's (width, height) in pixels.
+    """
+    width = spec['paper_width_mm'] * MM
+    height = spec['paper_height_mm'] * MM
+    pitch = spec['grid_size_mm'] * MM
+    scale = min(PREVIEW_HEIGHT_PX / height, PREVIEW_MAX_WIDTH_PX / width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    decimation = max(1, math.ceil(MIN_PITCH_PX / (pitch * scale)))
+    kind, geometry = grid_types.GEOMETRY[spec['grid_type']]
+    return kind, geometry(width, height, pitch * decimation), width, height, scale, size
+
+
+def render_svg(spec):
+    """
+    Render a preview of a canonical spec as SVG.
+
+    Returns:
+        bytes: The SVG document.
+    """
+    kind, primitives, width, height, scale, size = preview_geometry(spec)
+    # SVG's y axis points down; flip the PDF coordinates
+    flipped = primitives.copy()
+    flipped[:, 1] = height - flipped[:, 1]
+    if kind == 'segments':
+        flipped[:, 3] = height - flipped[:, 3]
+        template = "M%.0f %.0fL%.0f %.0f"
+        cap = "butt"
+        stroke_width = spec['line_thickness']
+    else:
+        template = "M%.0f %.0fh0"
+        cap = "round"
+        stroke_width = spec['line_thickness'] * grid_types.DOT_SIZE_FACTOR
+    # Keep hairlines visible at preview scale
+    stroke_width = max(stroke_width, 1 / scale)
+    path = (template * len(flipped)) % tuple(flipped.ravel().tolist())
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width:.1f} {height:.1f}" '
+        f'width="{size[0]}" height="{size[1]}">'
+        f'<rect width="100%" height="100%" fill="{spec["background_color"]}"/>'
+        f'<path d="{path}" fill="none" stroke="{spec["grid_color"]}" '
+        f'stroke-width="{stroke_width:.2f}" stroke-linecap="{cap}"/></svg>'
+    )
+    return svg.encode('utf-8')
+
+
+def render_png(spec):
+    """
+    Render a preview of a canonical spec as a PNG thumbnail.
+
+    Returns:
+        bytes: The PNG image.
+
+    Raises:
+        RuntimeError: If Pillow is not installed.
+    """
+    # Pillow is optional and imported on first use; PNG previews are
+    # disabled without it
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        raise RuntimeError("PNG previews require Pillow.")
+    kind, primitives, width, height, scale, size = preview_geometry(spec)
+    image = Image.new('RGB', size, spec['background_color'])
+    draw = ImageDraw.Draw(image)
+    pixels = primitives * scale
+    pixels[:, 1] = size[1] - pixels[:, 1]
+    if kind == 'segments':
+        pixels[:, 3] = size[1] - pixels[:, 3]
+        line_width = max(1, round(spec['line_thickness'] * scale))
+        for x0, y0, x1, y1 in np.rint(pixels).astype(int).tolist():
+            draw.line((x0, y0, x1, y1), fill=spec['grid_color'], width=line_width)
+    else:
+        radius = max(0.5, spec['line_thickness'] * grid_types.DOT_SIZE_FACTOR * scale / 2)
+        for x, y in pixels.tolist():
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=spec['grid_color'])
+    output = BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
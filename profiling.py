@@ -0,0 +1,203 @@
+"""
+Sampled cProfile and tracemalloc profiles of requests and renders.
+
+A sample profiles one block of code, a request view or a render in a pool
+worker, and writes three files named after the sample's id to a shared
+directory: <id>.prof, the cProfile stats (readable with pstats or snakeviz),
+<id>.tracemalloc, the allocation snapshot (tracemalloc.Snapshot.load), and
+<id>.json, a summary with the caller's tags (canonical spec, stage timings),
+wall and CPU time, peak traced memory, and the top functions and
+allocation sites. The summary is written last, so listings only see
+complete samples. Only the newest samples are kept.
+
+A process profiles one block at a time: cProfile and tracemalloc are
+process-wide, so a block that starts while another is being sampled runs
+unprofiled.
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import random
+import pstats
+import cProfile
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Frames recorded per allocation by tracemalloc
+TRACEMALLOC_FRAMES = 10
+
+
+class Profiler:
+    """
+    Decides which requests to profile and writes their samples.
+
+    Parameters:
+    - directory (str): Shared directory for sample files.
+    - rate (float): Fraction of requests sampled at random. 0 disables it.
+    - token (str): Secret that profiles a request when sent in its header.
+      None disables header-triggered profiling.
+    - keep (int): Samples kept in the directory; older ones are deleted.
+    - top (int): Functions and allocation sites listed in each summary.
+    """
+
+    def __init__(self, directory, rate=0.0, token=None, keep=200, top=25):
+        self.directory = directory
+        self.rate = rate
+        self.token = token
+        self.keep = keep
+        self.top = top
+        self._active = threading.Lock()
+        self._sampling = False
+        self.skipped = 0
+        self.write_errors = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A process forked during a sample (e.g. a render pool started by a
+        # profiled request) inherits the profiler and allocation tracing
+        # of the forking thread, and the held lock; it starts clean instead.
+        if self._sampling:
+            sys.setprofile(None)
+            tracemalloc.stop()
+            self._sampling = False
+        self._active = threading.Lock()
+
+    def authorized(self, header_value):
+        """Return True if a header value matches the configured token."""
+        if not self.token or not header_value:
+            return False
+        return hmac.compare_digest(header_value.encode('utf-8'), self.token.encode('utf-8'))
+
+    def wants(self, header_value=None):
+        """Return True if a request with this profiling header value should be sampled."""
+        return self.authorized(header_value) or (self.rate > 0 and random.random() < self.rate)
+
+    @contextmanager
+    def sample(self, kind):
+        """
+        Profile the block and write it as a sample.
+
+        Yields a dict of tags the block may fill in (e.g. spec, timings);
+        they are stored in the summary. Yields None, without profiling, if
+        this process is already profiling another block.
+
+        Parameters:
+        - kind (str): What is profiled, e.g. "request" or "render".
+        """
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            yield None
+            return
+        try:
+            self._sampling = True
+            tags = {}
+            profile = cProfile.Profile()
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            started_at = time.time()
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            profile.enable()
+            try:
+                yield tags
+            except BaseException as exc:
+                tags['error'] = f"{type(exc).__name__}: {exc}"
+                raise
+            finally:
+                profile.disable()
+                seconds = time.perf_counter() - start
+                cpu_seconds = time.process_time() - cpu_start
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self._sampling = False
+                summary = {
+                    'kind': kind,
+                    'pid': os.getpid(),
+                    'started_at': started_at,
+                    'seconds': seconds,
+                    'cpu_seconds': cpu_seconds,
+                    'peak_traced_bytes': peak,
+                    'tags': tags,
+                }
+                try:
+                    self._write(summary, profile, snapshot)
+                except OSError:
+                    # Samples are best effort; the profiled block still completes
+                    self.write_errors += 1
+        finally:
+            self._active.release()
+
+    def _write(self, summary, profile, snapshot):
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(summary['started_at']))
+        micros = int(summary['started_at'] % 1 * 1e6)
+        sample_id = f"{stamp}.{micros:06d}-{summary['pid']}-{summary['kind']}"
+        summary['id'] = sample_id
+        summary['top_functions'] = self._top_functions(profile)
+        summary['top_allocations'] = [
+            [f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size, stat.count]
+            for stat in snapshot.statistics('lineno')[:self.top]
+        ]
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, sample_id)
+        profile.dump_stats(base + '.prof')
+        snapshot.dump(base + '.tracemalloc')
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(summary, f)
+            os.replace(tmp_path, base + '.json')
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.prune()
+
+    def _top_functions(self, profile):
+        # [function, calls, own seconds, cumulative seconds], by cumulative time
+        rows = []
+        for (filename, lineno, name), (_, calls, own, cumulative, _) in pstats.Stats(profile).stats.items():
+            rows.append([f"{filename}:{lineno}({name})", calls, own, cumulative])
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows[:self.top]
+
+    def _sample_ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        # Ids start with the UTC start time, so they sort oldest first
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def prune(self):
+        """Delete the oldest samples beyond keep."""
+        ids = self._sample_ids()
+        for sample_id in ids[:max(0, len(ids) - self.keep)]:
+            for suffix in ('.json', '.prof', '.tracemalloc'):
+                try:
+                    os.unlink(os.path.join(self.directory, sample_id + suffix))
+                except OSError:
+                    # Already deleted by another worker
+                    pass
+
+    def slowest(self, limit=20, kind=None):
+        """
+        Return the summaries of the slowest kept samples, slowest first.
+
+        Parameters:
+        - limit (int): Maximum summaries returned.
+        - kind (str): Only return samples of this kind. None returns all.
+        """
+        summaries = []
+        for sample_id in self._sample_ids():
+            try:
+                with open(os.path.join(self.directory, sample_id + '.json'), encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if kind is None or summary['kind'] == kind:
+                summaries.append(summary)
+        summaries.sort(key=lambda summary: summary['seconds'], reverse=True)
+        return summaries[:limit]
@@ -0,0 +1,427 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    # Not POSIX; renders are coalesced within each process only
+    fcntl = None
+
+
+class _Flight:
+    # One in-progress render; followers wait on done, then read result or error.
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RenderCache:
+    """
+    Two-tier cache for rendered PDF documents.
+
+    The first tier is an in-process LRU bounded by the total size of the cached
+    documents. The second tier is a directory on disk shared by every worker;
+    entries are stored under the SHA-256 digest of their cache key and written
+    atomically, so concurrent workers never see partially written files.
+
+    An entry may carry a small JSON-serializable dict of metadata, kept
+    beside the document in memory and in a sidecar file on disk and read
+    with meta() without counting as a lookup.
+
+    Concurrent misses for the same key are coalesced by single_flight: one
+    caller renders and the others wait for its result. Threads of a process
+    wait on an in-flight table; with a disk tier, processes sharing it wait on
+    a byte-range lock in RENDER_LOCK_FILENAME and then read the stored entry.
+
+    Parameters:
+    - max_bytes (int): Byte budget for the in-process tier. 0 disables it.
+    - cache_dir (str): Directory for the shared disk tier. None disables it.
+    - disk_max_bytes (int): Byte budget for the disk tier. 0 means unbounded.
+    - on_coalesce (callable): Called with "thread" or "process" for every
+      render saved by coalescing, e.g. to update a shared metric.
+    """
+
+    # Re-check the disk budget after this many writes instead of on every write.
+    PRUNE_INTERVAL = 32
+
+    # Empty file in cache_dir; each key locks one byte at an offset taken
+    # from its digest, so one file serves every key.
+    RENDER_LOCK_FILENAME = 'render.lock'
+
+    def __init__(self, max_bytes, cache_dir=None, disk_max_bytes=0, on_coalesce=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.on_coalesce = on_coalesce
+        self._in_flight = {}
+        self._lock_fd = None
+        self._lock_pid = None
+        self._entries = OrderedDict()
+        self._meta = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced_threads = 0
+        self.coalesced_processes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def digest(key):
+        """Return the hex SHA-256 digest used to address a key on disk."""
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        digest = self.digest(key)
+        return os.path.join(self.cache_dir, digest[:2], digest + '.pdf')
+
+    @staticmethod
+    def _meta_path(path):
+        # Sidecar of the document at path; not counted against disk_max_bytes
+        return path[:-len('.pdf')] + '.json'
+
+    def get(self, key, count=True):
+        """
+        Look up a cached document.
+
+        Parameters:
+        - key (str): Canonical cache key.
+        - count (bool): Update the hit and miss counters. Lookups that repeat
+          one already counted for the same request (see single_flight) pass
+          False.
+
+        Returns:
+            bytes or None: The cached document, or None on a miss.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += count
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += count
+                return None
+            self.disk_hits += count
+            self._store_memory(key, data)
+        return data
+
+    def put(self, key, data, meta=None):
+        """Store a rendered document, and optionally its metadata dict, in both tiers."""
+        with self._lock:
+            self._store_memory(key, data, meta)
+        self._write_disk(key, lambda f: f.write(data), meta)
+
+    def put_file(self, key, source, meta=None):
+        """
+        Copy a rendered document from a file object into the disk tier only.
+
+        Used for documents too large to hold in memory; they are served from
+        the file returned by path().
+
+        Returns:
+            str or None: The path of the stored document, or None if the disk
+            tier is disabled or the write failed.
+        """
+        return self._write_disk(key, lambda f: shutil.copyfileobj(source, f), meta)
+
+    def meta(self, key):
+        """
+        Return the metadata stored with a document, without counting a lookup.
+
+        Returns:
+            dict or None: The metadata, or None if the document or its
+            metadata is not cached.
+        """
+        with self._lock:
+            if key in self._meta:
+                return self._meta[key]
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._meta_path(self._disk_path(key)), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            # Keep it with the document if that was read into memory (e.g.
+            # by get() after another process rendered it)
+            if key in self._entries:
+                self._meta[key] = meta
+        return meta
+
+    def path(self, key, count=True):
+        """
+        Look up a document in the disk tier without reading it.
+
+        Parameters:
+        - key (str): Canonical cache key.
+        - count (bool): Update the hit and miss counters, as for get().
+
+        Returns:
+            str or None: The path of the cached document, or None on a miss.
+        """
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            # Refresh the mtime so pruning approximates LRU across workers.
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += count
+            return None
+        with self._lock:
+            self.disk_hits += count
+        return path
+
+    def get_or_render(self, key, render):
+        """
+        Return the cached document for key, rendering and storing it on a miss.
+
+        Parameters:
+        - key (str): Canonical cache key.
+        - render (callable): Zero-argument function returning (document bytes,
+          metadata dict or None).
+
+        Returns:
+            bytes: The document.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        def render_and_put():
+            data, meta = render()
+            self.put(key, data, meta)
+            return data
+
+        return self.single_flight(key, lambda: self.get(key, count=False), render_and_put)
+
+    def single_flight(self, key, lookup, render):
+        """
+        Run render for a missed key, unless another caller already is.
+
+        The first caller for a key renders; other threads of this process
+        wait for it and share its result or exception. With a disk tier, the
+        renderer also holds the key's lock in RENDER_LOCK_FILENAME, and a
+        process that has to wait for that lock calls lookup before rendering
+        itself. render must therefore store its result before it returns.
+        The caller has already counted its miss, so lookup should not count
+        another one (e.g. get(key, count=False)).
+
+        Parameters:
+        - key (str): Canonical cache key.
+        - lookup (callable): Zero-argument function returning the stored
+          result, or None if it is missing.
+        - render (callable): Zero-argument function that renders and stores
+          the result and returns it.
+
+        Returns:
+            The result of render, or of lookup if another process rendered it.
+        """
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            self._count_coalesced('thread')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._render_locked(key, lookup, render)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+        return flight.result
+
+    def _render_locked(self, key, lookup, render):
+        fd = self._render_lock_fd()
+        if fd is None:
+            return render()
+        offset = int(self.digest(key)[:15], 16)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+        except OSError:
+            # Another process is rendering the key; wait for it to finish
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+            except OSError:
+                # Deadlock detected or lock unavailable; render unlocked
+                return render()
+        try:
+            # Whether we waited or not, another process may have stored the
+            # result since our miss
+            result = lookup()
+            if result is not None:
+                self._count_coalesced('process')
+                return result
+            return render()
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+
+    def _render_lock_fd(self):
+        # POSIX record locks belong to the process and are all released when
+        # it closes any descriptor of the file, so one descriptor stays open
+        # for the life of each process. A forked child opens its own.
+        if fcntl is None or not self.cache_dir:
+            return None
+        with self._lock:
+            if self._lock_pid != os.getpid():
+                try:
+                    self._lock_fd = os.open(os.path.join(self.cache_dir, self.RENDER_LOCK_FILENAME),
+                                            os.O_RDWR | os.O_CREAT, 0o644)
+                except OSError:
+                    self._lock_fd = None
+                self._lock_pid = os.getpid()
+            return self._lock_fd
+
+    def _count_coalesced(self, scope):
+        with self._lock:
+            if scope == 'thread':
+                self.coalesced_threads += 1
+            else:
+                self.coalesced_processes += 1
+        if self.on_coalesce is not None:
+            self.on_coalesce(scope)
+
+    def stats(self):
+        """Return hit/miss counters and current sizes for this process."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'pid': os.getpid(),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'coalesced_threads': self.coalesced_threads,
+                'coalesced_processes': self.coalesced_processes,
+                'memory_entries': len(self._entries),
+                'memory_bytes': self._size,
+                'memory_max_bytes': self.max_bytes,
+                'disk_dir': self.cache_dir,
+                'disk_max_bytes': self.disk_max_bytes,
+            }
+
+    def _store_memory(self, key, data, meta=None):
+        # Caller holds self._lock. Documents read back from disk come
+        # without their metadata; meta() loads it from the sidecar file.
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += len(data)
+        if meta is not None:
+            self._meta[key] = meta
+        while self._size > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._meta.pop(evicted_key, None)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # Refresh the mtime so pruning approximates LRU across workers.
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _write_disk(self, key, write, meta=None):
+        # write(f) writes the document to an open temporary file. The
+        # metadata sidecar goes first, so a visible document has its sidecar.
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return path
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if meta is not None:
+                self._write_file(directory, self._meta_path(path),
+                                 lambda f: f.write(json.dumps(meta).encode('utf-8')))
+            self._write_file(directory, path, write)
+        except OSError:
+            # The disk tier is best effort; the document is still served.
+            return None
+        self._puts_since_prune += 1
+        if self.disk_max_bytes and self._puts_since_prune >= self.PRUNE_INTERVAL:
+            self._puts_since_prune = 0
+            self.prune_disk()
+        return path
+
+    @staticmethod
+    def _write_file(directory, path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def prune_disk(self):
+        """Delete the least recently used disk entries until under budget."""
+        if not self.cache_dir or not self.disk_max_bytes:
+            return
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            try:
+                os.unlink(self._meta_path(path))
+            except OSError:
+                pass
+            total -= size
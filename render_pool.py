@@ -0,0 +1,114 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+
+class RenderQueueFull(Exception):
+    """Raised when a render is submitted while the pool's queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__("The server is busy rendering other documents. Please try again shortly.")
+        self.retry_after = retry_after
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish within the pool's timeout."""
+
+    def __init__(self, timeout, retry_after):
+        super().__init__(f"Rendering did not finish within {timeout:g} seconds.")
+        self.retry_after = retry_after
+
+
+class RenderPool:
+    """
+    Bounded process pool for CPU-heavy renders.
+
+    At most max_pending jobs (running plus queued) are accepted at a time;
+    submitting beyond that raises RenderQueueFull immediately instead of
+    queueing without bound. Waiting for a result is limited by timeout. A job
+    that times out keeps its slot until it actually finishes, so slow renders
+    keep exerting backpressure.
+
+    Parameters:
+    - max_workers (int): Worker processes. 0 renders inline in the caller.
+    - max_pending (int): Maximum jobs running or queued.
+    - timeout (float): Seconds to wait for a result.
+    - retry_after (int): Seconds suggested to clients when the pool is busy.
+    """
+
+    def __init__(self, max_workers, max_pending, timeout, retry_after=5):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _get_executor(self):
+        # The executor is created lazily in each process; a pool inherited
+        # through fork (e.g. gunicorn --preload) cannot be used by the child.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(*args) on the pool.
+
+        Returns:
+            Future: The pending result.
+
+        Raises:
+            RenderQueueFull: If max_pending jobs are already in flight.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise RenderQueueFull(self.retry_after)
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """
+        Run fn(*args) on the pool and wait for its result.
+
+        Raises:
+            RenderQueueFull: If the pool is saturated.
+            RenderTimeout: If the result is not ready within timeout seconds.
+        """
+        if self.max_workers <= 0:
+            return fn(*args)
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.timed_out += 1
+            raise RenderTimeout(self.timeout, self.retry_after)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time.
+            executor = self._executor
+            if executor is not None:
+                self._reset_executor(executor)
+            raise
@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+
+
+def init_db(database):
+    """Initialize the database and create the statistics table if it doesn't exist."""
+    conn = sqlite3.connect(database)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS statistics (
+            id INTEGER PRIMARY KEY,
+            pdf_count INTEGER DEFAULT 0
+        )
+    ''')
+    # Ensure there's a row in the table
+    c.execute('SELECT COUNT(*) FROM statistics')
+    if c.fetchone()[0] == 0:
+        c.execute('INSERT INTO statistics (pdf_count) VALUES (0)')
+    # One row per served PDF: canonical spec (JSON), seconds spent producing
+    # the response, its size, and whether it came from the render cache
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS render_log (
+            id INTEGER PRIMARY KEY,
+            created_at REAL NOT NULL,
+            spec TEXT NOT NULL,
+            render_seconds REAL NOT NULL,
+            output_bytes INTEGER NOT NULL,
+            cached INTEGER NOT NULL
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS render_log_created_at ON render_log (created_at)')
+    conn.commit()
+    conn.close()
+
+
+class BatchedWriter:
+    """
+    Base class for per-process buffers flushed to SQLite in batches.
+
+    Subclasses keep their pending data under self._lock and implement
+    _reset_pending, _pending_count, _take_pending, _write and _restore.
+    Pending data is written in a
+    single transaction when flush_threshold items are pending or every
+    flush_interval seconds, whichever comes first, and at interpreter exit.
+    The database is opened once per process in WAL mode so readers never wait
+    for a writer; after a fork, the child starts with its own connection,
+    flush thread and empty buffer.
+
+    Parameters:
+    - database (str): Path to the SQLite database.
+    - flush_interval (float): Maximum seconds between flushes.
+    - flush_threshold (int): Pending items that trigger an immediate flush.
+    """
+
+    thread_name = 'sqlite-flush'
+
+    def __init__(self, database, flush_interval=5.0, flush_threshold=50):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._reset_pending()
+        atexit.register(self.close)
+
+    def _reset_pending(self):
+        raise NotImplementedError
+
+    def _pending_count(self):
+        raise NotImplementedError
+
+    def _take_pending(self):
+        # Caller holds self._lock. Return the pending data and clear it.
+        raise NotImplementedError
+
+    def _write(self, conn, data):
+        # Write taken data to the database; the caller commits.
+        raise NotImplementedError
+
+    def _restore(self, data):
+        # Caller holds self._lock. Put back data whose write failed.
+        raise NotImplementedError
+
+    def _written(self, data):
+        # Caller holds self._lock. Called after data was committed.
+        pass
+
+    def _ensure_process(self):
+        # Caller holds self._lock. A forked worker must not reuse the parent's
+        # connection or thread, and the parent still owns what it left pending.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._conn = None
+        self._reset_pending()
+        self._wakeup = threading.Event()
+        self._flusher = None
+
+    def _connection(self):
+        # Caller holds self._lock.
+        if self._conn is None:
+            init_db(self.database)
+            conn = sqlite3.connect(self.database, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn = conn
+        return self._conn
+
+    def _start_flusher(self):
+        # Caller holds self._lock.
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name=self.thread_name, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        wakeup = self._wakeup
+        while not wakeup.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # The pending data is kept and retried on the next tick.
+                pass
+
+    def _added(self):
+        # Caller holds self._lock. Returns whether a flush is due.
+        self._start_flusher()
+        return self._pending_count() >= self.flush_threshold
+
+    def _flush_if_due(self, due):
+        if due:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+    def flush(self):
+        """Write all pending data to the database in one transaction."""
+        with self._lock:
+            self._ensure_process()
+            if not self._pending_count():
+                return
+            data = self._take_pending()
+            try:
+                conn = self._connection()
+                self._write(conn, data)
+                conn.commit()
+            except sqlite3.Error:
+                if self._conn is not None:
+                    self._conn.rollback()
+                self._restore(data)
+                raise
+            self._written(data)
+
+    def close(self):
+        """Flush pending data and close the connection."""
+        self._wakeup.set()
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._conn is not None and self._pid == os.getpid():
+                    self._conn.close()
+                self._conn = None
+
+
+class PdfCounter(BatchedWriter):
+    """
+    Per-process PDF download counter with batched SQLite writes.
+
+    Increments are accumulated in memory and added to statistics.pdf_count in a
+    single UPDATE (see BatchedWriter for when). Reads are served from a value
+    cached for read_ttl seconds plus this process's pending increments.
+
+    Parameters:
+    - database (str): Path to the SQLite database.
+    - flush_interval (float): Maximum seconds between flushes.
+    - flush_threshold (int): Pending increments that trigger an immediate flush.
+    - read_ttl (float): Seconds a count read from the database stays fresh.
+    """
+
+    thread_name = 'pdf-counter-flush'
+
+    def __init__(self, database, flush_interval=5.0, flush_threshold=50, read_ttl=2.0):
+        self.read_ttl = read_ttl
+        super().__init__(database, flush_interval, flush_threshold)
+
+    def _reset_pending(self):
+        self._pending = 0
+        self._cached_count = None
+        self._cached_at = 0.0
+
+    def _pending_count(self):
+        return self._pending
+
+    def increment(self, amount=1):
+        """Record amount generated PDFs."""
+        with self._lock:
+            self._ensure_process()
+            self._pending += amount
+            due = self._added()
+        self._flush_if_due(due)
+
+    def _take_pending(self):
+        pending = self._pending
+        self._pending = 0
+        return pending
+
+    def _write(self, conn, pending):
+        conn.execute('UPDATE statistics SET pdf_count = pdf_count + ? WHERE id = 1', (pending,))
+
+    def _restore(self, pending):
+        self._pending += pending
+
+    def _written(self, pending):
+        if self._cached_count is not None:
+            self._cached_count += pending
+
+    def get_count(self):
+        """Return the total PDF count, including this process's pending increments."""
+        with self._lock:
+            self._ensure_process()
+            now = time.monotonic()
+            if self._cached_count is None or now - self._cached_at >= self.read_ttl:
+                c = self._connection().execute('SELECT pdf_count FROM statistics WHERE id = 1')
+                self._cached_count = c.fetchone()[0]
+                self._cached_at = now
+            return self._cached_count + self._pending
+
+
+class RequestLog(BatchedWriter):
+    """
+    Append buffer for the render_log analytics table.
+
+    Each served PDF is appended to an in-memory list and inserted with
+    executemany when the buffer is flushed (see BatchedWriter), so logging
+    adds no SQLite commit to the request. Analytics are best effort: if the
+    database stays unavailable, the oldest entries beyond max_pending are
+    dropped.
+
+    Parameters:
+    - database (str): Path to the SQLite database.
+    - flush_interval (float): Maximum seconds between flushes.
+    - flush_threshold (int): Pending rows that trigger an immediate flush.
+    - max_pending (int): Rows kept in memory while writes fail.
+    """
+
+    thread_name = 'request-log-flush'
+
+    def __init__(self, database, flush_interval=5.0, flush_threshold=200, max_pending=10000):
+        self.max_pending = max_pending
+        super().__init__(database, flush_interval, flush_threshold)
+
+    def _reset_pending(self):
+        self._rows = []
+
+    def _pending_count(self):
+        return len(self._rows)
+
+    def record(self, spec, render_seconds, output_bytes, cached):
+        """
+        Append one served PDF to the log.
+
+        Parameters:
+        - spec (dict): Canonical spec of the PDF.
+        - render_seconds (float): Seconds spent producing the document.
+        - output_bytes (int): Size of the document.
+        - cached (bool): Whether the document came from the render cache.
+        """
+        row = (time.time(), json.dumps(spec, sort_keys=True, separators=(',', ':')),
+               render_seconds, output_bytes, int(cached))
+        with self._lock:
+            self._ensure_process()
+            self._rows.append(row)
+            due = self._added()
+        self._flush_if_due(due)
+
+    def _take_pending(self):
+        rows = self._rows
+        self._rows = []
+        return rows
+
+    def _write(self, conn, rows):
+        conn.executemany('INSERT INTO render_log (created_at, spec, render_seconds, output_bytes, cached) '
+                         'VALUES (?, ?, ?, ?, ?)', rows)
+
+    def _restore(self, rows):
+        self._rows = (rows + self._rows)[-self.max_pending:]
+
+
+def top_specs(database, limit, since):
+    """
+    Return the most requested specs in the render log.
+
+    Parameters:
+    - database (str): Path to the SQLite database.
+    - limit (int): Number of specs to return.
+    - since (float): Only count requests logged at or after this Unix time.
+
+    Returns:
+        list: (spec dict, request count) pairs, most requested first.
+    """
+    init_db(database)
+    conn = sqlite3.connect(database, timeout=30)
+    try:
+        rows = conn.execute(
+            'SELECT spec, COUNT(*) AS requests FROM render_log WHERE created_at >= ? '
+            'GROUP BY spec ORDER BY requests DESC LIMIT ?', (since, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(json.loads(spec), requests) for spec, requests in rows]
+
+
+def prune_request_log(database, before):
+    """Delete render log rows logged before the Unix time before; return how many."""
+    init_db(database)
+    conn = sqlite3.connect(database, timeout=30)
+    try:
+        deleted = conn.execute('DELETE FROM render_log WHERE created_at < ?', (before,)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return deleted
@@ -0,0 +1,21 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# Keep the app's database, cache and metrics out of the repository and the
+# shared defaults in /tmp. The directory is removed at exit, after the app's
+# own exit handlers (registered later, so run earlier) have flushed into it.
+_scratch = tempfile.mkdtemp(prefix='grid_web_tests_')
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ.setdefault('GRID_DATABASE', os.path.join(_scratch, 'statistics.db'))
+os.environ.setdefault('GRID_CACHE_DIR', os.path.join(_scratch, 'cache'))
+os.environ.setdefault('GRID_METRICS_DIR', os.path.join(_scratch, 'metrics'))
+os.environ.setdefault('GRID_PROFILE_DIR', os.path.join(_scratch, 'profiles'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+app.init_db()
@@ -0,0 +1,34 @@
+"""/batch limits concurrent batches, including renders left by a client that went away."""
+from concurrent.futures import Future
+
+import app
+
+
+class ManualPool:
+    # Stands in for BATCH_POOL; its renders finish when the test says so
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def test_batch_slot_is_held_until_running_renders_finish(monkeypatch):
+    pool = ManualPool()
+    monkeypatch.setattr(app, 'BATCH_POOL', pool)
+    monkeypatch.setattr(app, '_batch_slots', app.threading.BoundedSemaphore(1))
+
+    assert app._batch_slots.acquire(blocking=False)
+    submit, release = app.hold_batch_slot()
+    running = submit(app.render_spec, {})
+    queued = submit(app.render_spec, {})
+    # The client went away: queued renders are cancelled, the response closed
+    queued.cancel()
+    release()
+    assert not app._batch_slots.acquire(blocking=False)
+
+    running.set_result(b'%PDF')
+    assert app._batch_slots.acquire(blocking=False)
+    app._batch_slots.release()
@@ -0,0 +1,23 @@
+"""Resumed downloads are not logged as new requests for a spec."""
+import pytest
+
+import app
+
+
+# (STREAM_MIN_BYTES, grid size): sent from memory, then from a cache file
+@pytest.mark.parametrize("stream_min_bytes, grid_size_mm", [(1024 * 1024, 3), (0, 4)], ids=["memory", "file"])
+def test_range_requests_are_not_logged(monkeypatch, stream_min_bytes, grid_size_mm):
+    logged = []
+    monkeypatch.setattr(app, 'STREAM_MIN_BYTES', stream_min_bytes)
+    monkeypatch.setattr(app.REQUEST_LOG, 'record', lambda spec, *args, **kwargs: logged.append(spec))
+    client = app.app.test_client()
+    url = (f'/grid.pdf?background_color=%23FFFFFF&grid_color=%23203040&grid_size_mm={grid_size_mm}'
+           '&line_thickness=0.3&predefined_size=A6')
+
+    full = client.get(url)
+    assert full.status_code == 200
+    resumed = client.get(url, headers={'Range': 'bytes=100-'})
+    assert resumed.status_code == 206
+    full.close()
+    resumed.close()
+    assert len(logged) == 1
@@ -0,0 +1,12 @@
+"""generate.py renders sheets the web app's render budget would refuse."""
+import generate
+import grids
+
+
+def test_large_sheets_are_not_over_budget():
+    row = {'predefined_size': 'A0', 'grid_size_mm': '0.5', 'grid_type': 'dot'}
+    assert grids.parse_grid_params(grids.query_grid_args(generate.MultiDict(row)))[2]
+
+    jobs, invalid = generate.plan_jobs([row])
+    assert invalid == {}
+    assert [spec['grid_type'] for _, spec in jobs] == ['dot']
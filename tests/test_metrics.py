@@ -0,0 +1,52 @@
+"""Counters summed across process snapshots never go down."""
+import time
+
+import metrics
+
+
+def test_reused_pid_keeps_exited_process_totals(tmp_path):
+    # Two registries in one process stand in for a worker that exited and a
+    # new worker that was given the same PID
+    exited = metrics.Metrics(str(tmp_path))
+    exited.counter('grid_errors_total', 'Failed requests by kind.')
+    exited.inc('grid_errors_total', 5, kind='render')
+    exited.write_snapshot()
+
+    reused = metrics.Metrics(str(tmp_path))
+    reused.counter('grid_errors_total', 'Failed requests by kind.')
+    reused.inc('grid_errors_total', kind='render')
+    reused.write_snapshot()
+
+    assert 'grid_errors_total{kind="render"} 6' in reused.render().splitlines()
+
+
+def test_idle_writer_publishes_its_last_updates(tmp_path):
+    writer = metrics.Metrics(str(tmp_path), write_interval=0.05)
+    writer.counter('grid_errors_total', 'Failed requests by kind.')
+    for _ in range(3):
+        writer.inc('grid_errors_total', kind='render')
+    # The writer records nothing more; another worker scrapes later
+    time.sleep(0.3)
+
+    reader = metrics.Metrics(str(tmp_path))
+    reader.counter('grid_errors_total', 'Failed requests by kind.')
+    assert 'grid_errors_total{kind="render"} 3' in reader.render().splitlines()
+
+
+def counter_lines(registry, name):
+    return [line for line in registry.render().splitlines() if line.startswith(name)]
+
+
+def test_previews_are_not_counted_as_downloads():
+    from app import METRICS, app
+
+    client = app.test_client()
+    fields = {'predefined_size': 'A5', 'grid_size_mm': '5'}
+    before = counter_lines(METRICS, 'grid_paper_size_total'), counter_lines(METRICS, 'grid_errors_total')
+    assert client.get('/preview.svg', query_string=fields).status_code == 200
+    assert client.get('/preview.svg', query_string={**fields, 'grid_size_mm': 'x'}).status_code == 400
+    after = counter_lines(METRICS, 'grid_paper_size_total'), counter_lines(METRICS, 'grid_errors_total')
+    assert after == before
+
+    client.get('/grid.pdf', query_string=fields, follow_redirects=True)
+    assert 'grid_paper_size_total{paper_size="A5"} 1' in counter_lines(METRICS, 'grid_paper_size_total')
@@ -0,0 +1,37 @@
+"""Previews stay screen-sized whatever the sheet's aspect ratio."""
+import re
+from io import BytesIO
+
+import pytest
+
+import preview
+from grids import canonical_spec
+
+# (width mm, height mm): A4, then long, thin sheets either way
+SHEETS = [(210, 297), (10000, 10), (100000, 1), (1, 100000)]
+
+
+def spec(width_mm, height_mm, grid_type):
+    return canonical_spec(width_mm, height_mm, 5, '#B7C9EE', '#FFFFFF', 0.3, grid_type=grid_type)
+
+
+@pytest.mark.parametrize("grid_type", ["square", "dot"])
+@pytest.mark.parametrize("width_mm, height_mm", SHEETS)
+def test_preview_fits_its_box(width_mm, height_mm, grid_type):
+    sheet = spec(width_mm, height_mm, grid_type)
+    kind, primitives, width, height, scale, size = preview.preview_geometry(sheet)
+    assert size[0] <= preview.PREVIEW_MAX_WIDTH_PX and size[1] <= preview.PREVIEW_HEIGHT_PX
+    assert max(size) in (preview.PREVIEW_MAX_WIDTH_PX, preview.PREVIEW_HEIGHT_PX)
+    # Decimation keeps the number of lines or dots screen-sized too
+    assert len(primitives) <= (size[0] / preview.MIN_PITCH_PX + 2) * (size[1] / preview.MIN_PITCH_PX + 2)
+
+    svg = preview.render_svg(sheet).decode('utf-8')
+    assert re.search(r'width="(\d+)" height="(\d+)">', svg).groups() == (str(size[0]), str(size[1]))
+
+
+@pytest.mark.parametrize("width_mm, height_mm", SHEETS)
+def test_png_preview_fits_its_box(width_mm, height_mm):
+    Image = pytest.importorskip("PIL.Image")
+    sheet = spec(width_mm, height_mm, "square")
+    with Image.open(BytesIO(preview.render_png(sheet))) as image:
+        assert image.size == preview.preview_geometry(sheet)[5]
@@ -0,0 +1,20 @@
+"""Profiling samples are only served to requests carrying the token."""
+from app import PROFILE_HEADER, PROFILER, app
+
+
+def test_profiles_are_not_served_without_a_token(monkeypatch):
+    monkeypatch.setattr(PROFILER, 'token', None)
+    client = app.test_client()
+    assert client.get('/profiles').status_code == 404
+    assert client.get('/profiles/x.json', headers={PROFILE_HEADER: ''}).status_code == 404
+
+
+def test_profiles_require_the_token(monkeypatch):
+    monkeypatch.setattr(PROFILER, 'token', 'secret')
+    client = app.test_client()
+    assert client.get('/profiles').status_code == 403
+    assert client.get('/profiles', headers={PROFILE_HEADER: 'wrong'}).status_code == 403
+    assert client.get('/profiles/x.json').status_code == 403
+    response = client.get('/profiles', headers={PROFILE_HEADER: 'secret'})
+    assert response.status_code == 200
+    assert response.get_json() == {'samples': []}
@@ -0,0 +1,139 @@
+"""
+The native PDF writer must produce valid PDFs that look like ReportLab's.
+
+Native output is parsed strictly with pypdf, and rasterized with PyMuPDF and
+compared with the "reportlab" engine's output of the same spec. Tiling-pattern
+output must line up with explicit lines up to the far page edges.
+"""
+import logging
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+import grid_types
+from grids import create_grid_pdf
+from gridpdf import MM
+
+pypdf = pytest.importorskip("pypdf")
+pymupdf = pytest.importorskip("pymupdf")
+
+# Anti-aliased edges differ slightly between the engines' path coordinates
+MAX_PIXEL_DIFFERENCE = 32
+MAX_MEAN_DIFFERENCE = 0.5
+
+RASTER_DPI = 100
+
+# Pixels per point for the pattern alignment check
+ALIGNMENT_ZOOM = 4
+
+# Average darkness (0-255) a line must add over the lightest column or row
+MIN_LINE_CONTRAST = 16
+
+# Line centers may differ by this many device pixels; viewers snap pattern
+# cells to the pixel grid, and centers are estimated from anti-aliased pixels
+TOLERANCE_PX = 1.5
+
+# (width mm, height mm, grid size mm, grid type): sizes that are not a
+# multiple of the grid size, so the last cell is cut off
+PATTERN_CASES = [
+    (210, 297, 5, "square"),
+    (210, 297, 7, "square"),
+    (297, 420, 1, "square"),
+    (200, 300, 3.3, "dot"),
+    (210, 297, 7, "ruled"),
+]
+
+VARIANTS = {
+    "page": {},
+    "compact": {"compact": True},
+    "notebook": {"pages": 3, "binding_margin_mm": 10, "page_numbers": True},
+}
+
+
+def render(engine, grid_type, **options):
+    """Render a black A5 grid on a tinted background with the given engine."""
+    with create_grid_pdf(148, 210, 5, "#000000", "#FFFFEE", 0.5, engine=engine, grid_type=grid_type,
+                         **options) as pdf:
+        return pdf.read()
+
+
+def rasterize(data):
+    """Return every page of a PDF as a grayscale array."""
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        images = []
+        for page in document:
+            pixmap = page.get_pixmap(dpi=RASTER_DPI, colorspace=pymupdf.csGRAY)
+            images.append(np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width))
+        return images
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("grid_type", grid_types.GRID_TYPES)
+def test_native_output_parses_strictly(grid_type, variant, caplog):
+    options = VARIANTS[variant]
+    data = render("native", grid_type, **options)
+    # A silent fallback to ReportLab would also parse
+    assert b"ReportLab" not in data
+
+    with caplog.at_level(logging.WARNING, logger="pypdf"):
+        reader = pypdf.PdfReader(BytesIO(data), strict=True)
+        assert len(reader.pages) == options.get("pages", 1)
+        for page in reader.pages:
+            assert float(page.mediabox.width) == pytest.approx(148 * MM, abs=0.01)
+            assert float(page.mediabox.height) == pytest.approx(210 * MM, abs=0.01)
+            assert page.get_contents().get_data()
+            for xobject in page.get("/Resources", {}).get("/XObject", {}).values():
+                assert xobject.get_object().get_data()
+    assert not caplog.records
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("grid_type", grid_types.GRID_TYPES)
+def test_native_output_renders_like_reportlab(grid_type, variant):
+    native = rasterize(render("native", grid_type, **VARIANTS[variant]))
+    reportlab = rasterize(render("reportlab", grid_type, **VARIANTS[variant]))
+    assert len(native) == len(reportlab)
+    for number, (expected, actual) in enumerate(zip(reportlab, native), 1):
+        assert actual.shape == expected.shape, f"page {number}"
+        difference = np.abs(actual.astype(int) - expected.astype(int))
+        assert difference.max() <= MAX_PIXEL_DIFFERENCE, f"page {number}"
+        assert difference.mean() <= MAX_MEAN_DIFFERENCE, f"page {number}"
+
+
+def line_centers(image, axis):
+    """
+    Return the centers, in pixels, of the lines crossing an axis.
+
+    Darkness is averaged across the other axis, so lines running along it
+    only add a constant; runs darker than halfway between the lightest and
+    darkest profile values, and clearly darker than the lightest, are lines.
+    """
+    profile = 255 - image.mean(axis=axis)
+    dark = profile > max((profile.min() + profile.max()) / 2, profile.min() + MIN_LINE_CONTRAST)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], dark.astype(np.int8), [0]))))
+    return np.array([np.average(np.arange(start, stop), weights=profile[start:stop])
+                     for start, stop in zip(edges[::2], edges[1::2])])
+
+
+def rasterize_black_grid(width_mm, height_mm, grid_size_mm, grid_type, mode):
+    """Render a sheet in black on white and return its page as a grayscale array."""
+    with create_grid_pdf(width_mm, height_mm, grid_size_mm, grid_color="#000000", line_thickness=0.5,
+                         grid_type=grid_type, render_mode=mode) as pdf:
+        data = pdf.read()
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        pixmap = document[0].get_pixmap(matrix=pymupdf.Matrix(ALIGNMENT_ZOOM, ALIGNMENT_ZOOM),
+                                        colorspace=pymupdf.csGRAY)
+    return np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width)
+
+
+@pytest.mark.parametrize("width_mm, height_mm, grid_size_mm, grid_type", PATTERN_CASES)
+def test_pattern_output_lines_up_with_paths(width_mm, height_mm, grid_size_mm, grid_type):
+    path = rasterize_black_grid(width_mm, height_mm, grid_size_mm, grid_type, "path")
+    pattern = rasterize_black_grid(width_mm, height_mm, grid_size_mm, grid_type, "pattern")
+    for axis in (0, 1):
+        expected = line_centers(path, axis)
+        actual = line_centers(pattern, axis)
+        # A missing or extra line at a far edge changes the count
+        assert len(actual) == len(expected), f"axis {axis}"
+        assert np.abs(actual - expected).max(initial=0) <= TOLERANCE_PX, f"axis {axis}"
@@ -0,0 +1,79 @@
+"""RenderCache tiers, metadata and counters."""
+import os
+
+from render_cache import RenderCache
+
+
+def pdf_files(directory):
+    return [name for _, _, names in os.walk(directory) for name in names if name.endswith('.pdf')]
+
+
+def test_metadata_is_stored_beside_the_document(tmp_path):
+    cache = RenderCache(max_bytes=1024, cache_dir=str(tmp_path))
+    cache.put('a', b'%PDF-a', {'stream_bytes': 10, 'compressed_bytes': 4})
+    assert cache.meta('a') == {'stream_bytes': 10, 'compressed_bytes': 4}
+    # Only the document counts against the disk budget
+    assert len(pdf_files(tmp_path)) == 1
+    # Reading metadata is not a lookup
+    assert cache.stats()['misses'] == 0 and cache.stats()['memory_hits'] == 0
+
+    # Another process sees it through the disk tier, also after reading the
+    # document into its memory tier
+    other = RenderCache(max_bytes=1024, cache_dir=str(tmp_path))
+    assert other.get('a') == b'%PDF-a'
+    assert other.meta('a') == {'stream_bytes': 10, 'compressed_bytes': 4}
+    assert other.meta('b') is None
+
+
+def test_put_file_metadata(tmp_path):
+    cache = RenderCache(max_bytes=0, cache_dir=str(tmp_path))
+    source = tmp_path / 'source.pdf'
+    source.write_bytes(b'%PDF-large')
+    with open(source, 'rb') as f:
+        path = cache.put_file('large', f, {'stream_bytes': 1, 'compressed_bytes': 1})
+    assert open(path, 'rb').read() == b'%PDF-large'
+    assert cache.meta('large') == {'stream_bytes': 1, 'compressed_bytes': 1}
+
+
+def test_pruning_removes_metadata(tmp_path):
+    cache = RenderCache(max_bytes=0, cache_dir=str(tmp_path), disk_max_bytes=1)
+    cache.put('a', b'%PDF-a', {'stream_bytes': 1, 'compressed_bytes': 1})
+    cache.prune_disk()
+    assert pdf_files(tmp_path) == []
+    assert cache.meta('a') is None
+
+
+def test_download_reports_stream_sizes_without_extra_lookups():
+    from app import RENDER_CACHE, app
+
+    client = app.test_client()
+    url = '/grid.pdf?background_color=%23FFFFFF&grid_color=%23102030&grid_size_mm=4&line_thickness=0.3&predefined_size=A6'
+    before = RENDER_CACHE.stats()
+    for _ in range(2):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert int(response.headers['X-Grid-Stream-Bytes']) > int(response.headers['X-Grid-Stream-Compressed-Bytes'])
+    after = RENDER_CACHE.stats()
+    # One counted miss for the first request and one hit for the second
+    assert after['misses'] - before['misses'] == 1
+    assert after['memory_hits'] - before['memory_hits'] == 1
+    assert after['disk_hits'] == before['disk_hits']
+
+
+def test_cold_render_counts_one_miss(tmp_path):
+    cache = RenderCache(max_bytes=1024, cache_dir=str(tmp_path))
+    assert cache.get_or_render('a', lambda: (b'%PDF-a', None)) == b'%PDF-a'
+    assert cache.get_or_render('a', lambda: (b'%PDF-b', None)) == b'%PDF-a'
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses'], stats['hit_ratio']) == (1, 1, 0.5)
+
+    # The large-file path looks up with path() the same way
+    def render():
+        with open(tmp_path / 'source.pdf', 'w+b') as f:
+            f.write(b'%PDF-large')
+            f.seek(0)
+            return cache.put_file('large', f)
+
+    assert cache.path('large') is None
+    assert cache.single_flight('large', lambda: cache.path('large', count=False), render)
+    assert cache.stats()['misses'] == 2
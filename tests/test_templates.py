@@ -0,0 +1,49 @@
+"""
+Pages written from a cached PageTemplate must be the same bytes as full renders.
+"""
+import pytest
+
+import gridpdf
+import grid_types
+import grids
+
+# (grid color, background color, line thickness)
+STYLES = [
+    ("#B7C9EE", "#FFFFFF", 0.3),
+    ("#000000", "#FFFFFF", 1),
+    ("#FF8800", "#FFFFE0", 0.25),
+]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("grid_type", grid_types.GRID_TYPES)
+def test_template_variants_match_full_renders(grid_type, compact):
+    width, height, pitch = 148 * gridpdf.MM, 210 * gridpdf.MM, 5 * gridpdf.MM
+    template = gridpdf.page_template(width, height,
+                                     grids.iter_grid_type_geometry(width, height, pitch, grid_type, compact))
+    for grid_color, background_color, thickness in STYLES:
+        style = grids.grid_type_style(width, height, grid_color, background_color, thickness, grid_type, compact)
+        full = b"".join(gridpdf.iter_page_pdf(
+            width, height, grids.iter_grid_type_geometry(width, height, pitch, grid_type, compact), style=style))
+        assert template.render(style) == full
+        for templates in (True, False):
+            with grids.create_grid_pdf(148, 210, 5, grid_color, background_color, thickness, grid_type=grid_type,
+                                       compact=compact, templates=templates) as pdf:
+                assert pdf.read() == full
+
+
+def test_templates_can_be_bypassed():
+    spec = dict(paper_width_mm=123.45, paper_height_mm=67.8, grid_size_mm=4.5)
+    key = grids.page_template_key(123.45, 67.8, 4.5, "square", False)
+
+    timings = {}
+    grids.create_grid_pdf(**spec, templates=False, timings=timings).close()
+    assert "write" in timings
+    assert grids.PAGE_TEMPLATES.get(key) is None
+
+    grids.create_grid_pdf(**spec, timings=timings).close()
+    assert grids.PAGE_TEMPLATES.get(key) is not None
+
+    timings = {}
+    grids.create_grid_pdf(**spec, grid_color="#000000", timings=timings).close()
+    assert list(timings) == ["template"]
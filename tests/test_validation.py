@@ -0,0 +1,73 @@
+"""Out-of-range numbers are rejected as validation errors on every endpoint."""
+import pytest
+
+from app import app
+from grids import parse_grid_params
+
+VALID = {
+    'paper_size_option': 'predefined',
+    'predefined_size': 'A4',
+    'grid_size_mm': '5',
+    'grid_color': '#B7C9EE',
+    'background_color': '#FFFFFF',
+    'line_thickness': '0.3',
+}
+
+INVALID = [
+    {'grid_size_mm': '0.0001'},
+    {'grid_size_mm': 'nan'},
+    {'grid_size_mm': 'inf'},
+    {'line_thickness': 'inf'},
+    {'line_thickness': '0.0001'},
+    {'binding_margin_mm': 'nan'},
+    {'paper_size_option': 'custom', 'custom_width_cm': 'inf', 'custom_height_cm': '20'},
+    {'paper_size_option': 'custom', 'custom_width_cm': '21', 'custom_height_cm': 'nan'},
+    {'paper_size_option': 'custom', 'custom_width_cm': '0.0001', 'custom_height_cm': '20'},
+]
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize("fields", INVALID)
+def test_parse_grid_params_rejects(fields):
+    spec, _, errors = parse_grid_params({**VALID, **fields})
+    assert spec is None
+    assert errors
+
+
+@pytest.mark.parametrize("fields", INVALID)
+def test_endpoints_reject(client, fields):
+    data = {**VALID, **fields}
+    response = client.post('/', data=data)
+    assert response.status_code == 200 and response.mimetype == 'text/html'
+    assert client.get('/grid.pdf', query_string=data).status_code == 400
+    assert client.get('/preview.svg', query_string=data).status_code == 400
+    assert client.post('/batch', json=[data]).status_code == 400
+
+
+# Values only a JSON body can carry, plus page counts int() would accept
+INVALID_JSON = [
+    {'output_filename': 5},
+    {'predefined_size': ['A4']},
+    {'paper_size_option': {'predefined': True}},
+    {'grid_type': ['square']},
+    {'pages': 0},
+    {'pages': 2.5},
+    {'pages': '2.5'},
+]
+
+
+@pytest.mark.parametrize("fields", INVALID_JSON)
+def test_batch_reports_invalid_json_values_per_index(client, fields):
+    response = client.post('/batch', json=[VALID, {**VALID, **fields}])
+    assert response.status_code == 400
+    assert list(response.get_json()['errors']) == ['1']
+
+
+def test_whole_page_counts_are_accepted():
+    for pages in (2, 2.0, '2'):
+        spec, _, errors = parse_grid_params({**VALID, 'pages': pages})
+        assert not errors and spec['pages'] == 2